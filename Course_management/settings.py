@@ -50,8 +50,11 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    )
+        # builds request.user from the token claims, no query per request
+        "users.authentication.ClaimsJWTAuthentication",
+    ),
+    "DEFAULT_PAGINATION_CLASS": "common.pagination.paginators.BaseCursorPagination",
+    "PAGE_SIZE": 20,
 }
 
 from datetime import timedelta
@@ -63,6 +66,7 @@ SIMPLE_JWT = {
     "AUTH_HEADER_NAME": "HTTP_AUTHORIZATION",
     "USER_ID_FIELD": "id",
     "USER_ID_CLAIM": "user_id",
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.CustomTokenRefreshSerializer",
 }
 
 MIDDLEWARE = [
@@ -112,6 +116,44 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": config("CACHE_LOCATION", default="course-app"),
+    }
+}
+
+# seconds a user's course roles stay cached, changes invalidate them right away
+MEMBERSHIP_CACHE_TIMEOUT = config("MEMBERSHIP_CACHE_TIMEOUT", default=300, cast=int)
+# roles are cached across requests only in a cache all workers share (redis,
+# memcached, database): invalidating a per-process LocMemCache reaches just the
+# worker that handled the change, the others would keep granting a removed role.
+# Without it every request resolves the roles once for itself.
+MEMBERSHIP_CACHE = config(
+    "MEMBERSHIP_CACHE",
+    default=CACHES["default"]["BACKEND"]
+    != "django.core.cache.backends.locmem.LocMemCache",
+    cast=bool,
+)
+
+# seconds an upload validation verdict is kept, keyed by file content and validator settings
+FILE_VALIDATION_CACHE_TIMEOUT = config(
+    "FILE_VALIDATION_CACHE_TIMEOUT", default=7 * 24 * 60 * 60, cast=int
+)
+
+
+# worker threads finishing submissions queued through the async submit endpoint
+SUBMISSION_INGESTION_WORKERS = config(
+    "SUBMISSION_INGESTION_WORKERS", default=4, cast=int
+)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
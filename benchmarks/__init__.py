@@ -0,0 +1,50 @@
+"""
+Benchmarks of the request paths the performance work touched. Each one is a
+module run from the project root, e.g.
+
+    python -m benchmarks.submission_ingestion --students 500
+
+They run against a test database created from DATABASES and dropped at the
+end, so the configured database is never written to. Use Postgres for numbers
+that mean anything, sqlite only checks that a benchmark runs.
+"""
+
+import os
+import statistics
+from contextlib import contextmanager
+
+
+def setup():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "Course_management.settings")
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(name, verbosity=0)
+        teardown_test_environment()
+
+
+def summary(seconds):
+    """
+    p50, p95, p99 and max of the given durations, in milliseconds.
+    """
+    ms = sorted(duration * 1000 for duration in seconds)
+    cuts = (
+        statistics.quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else ms * 99
+    )
+    return (
+        f"p50 {cuts[49]:8.2f} ms  p95 {cuts[94]:8.2f} ms  "
+        f"p99 {cuts[98]:8.2f} ms  max {ms[-1]:8.2f} ms"
+    )
@@ -0,0 +1,121 @@
+"""
+Time of the course list query for a teacher and a student, with the
+EXISTS filter of CourseQuerySet.visible_to against the OR of two querysets
+it replaced, as the table of courses grows.
+
+    python -m benchmarks.course_visibility --courses 10000 100000 1000000
+"""
+
+import argparse
+import random
+import time
+from benchmarks import setup, summary, test_database
+
+BATCH_SIZE = 5000
+
+
+def seed(start, stop, public_share):
+    from courses.models import Course
+
+    for first in range(start, stop, BATCH_SIZE):
+        Course.objects.bulk_create(
+            Course(
+                title=f"Course {number}",
+                slug=f"course-{number}",
+                visibility=(
+                    Course.Visibility.PUBLIC
+                    if random.random() < public_share
+                    else Course.Visibility.PRIVATE
+                ),
+            )
+            for number in range(first, min(first + BATCH_SIZE, stop))
+        )
+
+
+def join_members(teacher, student, memberships):
+    from courses.models import Course, CourseTeacher, Enrollment
+
+    CourseTeacher.objects.all().delete()
+    Enrollment.objects.all().delete()
+    ids = list(Course.objects.values_list("pk", flat=True))
+    CourseTeacher.objects.bulk_create(
+        CourseTeacher(course_id=course_id, teacher=teacher)
+        for course_id in random.sample(ids, memberships)
+    )
+    Enrollment.objects.bulk_create(
+        Enrollment(
+            course_id=course_id,
+            student=student,
+            status=Enrollment.Status.ACCEPTED,
+            is_active=True,
+        )
+        for course_id in random.sample(ids, memberships)
+    )
+
+
+def or_of_querysets(user):
+    # CourseViewSet.get_queryset before visible_to; the teacher branch used
+    # `teachers__teacher`, which is not a valid lookup, the intended one is here
+    from courses.models import Course
+
+    public = Course.objects.filter(visibility=Course.Visibility.PUBLIC)
+    if user.role == user.Role.TEACHER:
+        return Course.objects.filter(course_teachers__teacher=user) | public
+    return (
+        Course.objects.filter(enrollments__student=user, enrollments__is_active=True)
+        | public
+    )
+
+
+def timed(run, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--courses", type=int, nargs="+", default=[10000])
+    parser.add_argument("--public-share", type=float, default=0.2)
+    parser.add_argument("--memberships", type=int, default=50)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from courses.models import Course
+
+    User = get_user_model()
+    random.seed(0)
+    with test_database():
+        teacher = User.objects.create_user("teacher@example.com", role="TEACHER")
+        student = User.objects.create_user("student@example.com", role="STUDENT")
+        seeded = 0
+        for size in sorted(args.courses):
+            seed(seeded, size, args.public_share)
+            seeded = size
+            join_members(teacher, student, args.memberships)
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE")
+
+            print(f"\n{size} courses, {args.memberships} memberships per user")
+            for user in (teacher, student):
+                for name, queryset in (
+                    ("visible_to", Course.objects.visible_to(user)),
+                    ("OR of querysets", or_of_querysets(user)),
+                ):
+                    page = queryset.order_by("-created_at", "-pk")[: args.page_size]
+                    samples = timed(lambda: list(page.all()), args.repeat)
+                    print(f"{user.role:8} {name:16} page  {summary(samples)}")
+                    samples = timed(queryset.count, args.repeat)
+                    print(f"{user.role:8} {name:16} count {summary(samples)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Overhead of the QueryMetrics execute wrapper the request logging middleware
+runs every view under: the same queries timed with and without it, in
+alternating rounds so both see the same database and cache state.
+
+    python -m benchmarks.query_metrics --queries 2000 --rounds 10
+"""
+
+import argparse
+import statistics
+import time
+from benchmarks import setup, test_database
+
+
+def run_queries(count):
+    from django.contrib.auth import get_user_model
+
+    users = get_user_model().objects
+    start = time.perf_counter()
+    for number in range(count):
+        users.filter(pk=number).exists()
+    return time.perf_counter() - start
+
+
+def wrapper_cost(count):
+    # the wrapper around an execute that does nothing, i.e. its own cost
+    from common.logging.query_metrics import QueryMetrics
+
+    metrics = QueryMetrics()
+    execute = lambda sql, params, many, context: None  # noqa: E731
+    start = time.perf_counter()
+    for _ in range(count):
+        metrics(execute, "SELECT 1", (), False, {})
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connection
+    from common.logging.query_metrics import QueryMetrics
+
+    with test_database():
+        run_queries(args.queries)  # warm up
+        plain, wrapped = [], []
+
+        def run_plain():
+            plain.append(run_queries(args.queries))
+
+        def run_wrapped():
+            metrics = QueryMetrics()
+            with connection.execute_wrapper(metrics):
+                wrapped.append(run_queries(args.queries))
+            metrics.as_dict()
+
+        for round_number in range(args.rounds):
+            # alternate the order, so neither one always runs second
+            pair = (run_plain, run_wrapped)
+            for run in pair if round_number % 2 else reversed(pair):
+                run()
+
+    per_query = statistics.median(plain) / args.queries
+    overhead = statistics.median(wrapped) / args.queries - per_query
+    print(f"{connection.vendor}, {args.rounds} rounds of {args.queries} queries")
+    print(
+        f"query without the wrapper   {per_query * 1e6:8.1f} us (median, rounds "
+        f"spread {statistics.pstdev(plain) / statistics.median(plain):.1%})"
+    )
+    print(
+        f"added by the wrapper        {overhead * 1e6:8.1f} us "
+        f"({overhead / per_query:+.2%})"
+    )
+    print(f"wrapper alone, no-op query  {wrapper_cost(100000) * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
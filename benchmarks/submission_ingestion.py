@@ -0,0 +1,129 @@
+"""
+Latency of submitting during a deadline burst: every student posts a text
+with one attachment at the same time, once to the async endpoint and once
+with the same work done on the request thread, as a synchronous create does.
+
+    python -m benchmarks.submission_ingestion --students 500 --concurrency 50
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from benchmarks import setup, summary, test_database
+
+
+class InlineExecutor:
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+def seed(students):
+    from django.contrib.auth import get_user_model
+    from courses.models import Course, Enrollment
+    from lectures.models import HomeworkAssignment, Lecture
+
+    User = get_user_model()
+    teacher = User.objects.create_user("teacher@example.com", role=User.Role.TEACHER)
+    course = Course.objects.create(title="Course", created_by=teacher)
+    lecture = Lecture.objects.create(course=course, title="Lecture")
+    users = User.objects.bulk_create(
+        User(email=f"student{number}@example.com", role=User.Role.STUDENT)
+        for number in range(students)
+    )
+    Enrollment.objects.bulk_create(
+        Enrollment(
+            course=course,
+            student=user,
+            status=Enrollment.Status.ACCEPTED,
+            is_active=True,
+        )
+        for user in users
+    )
+    return lecture, users
+
+
+def burst(lecture, users, concurrency, title):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.db import connection
+    from rest_framework.test import APIClient
+    from lectures.models import HomeworkAssignment
+
+    assignment = HomeworkAssignment.objects.create(lecture=lecture, title=title)
+    url = (
+        f"/api/courses/{lecture.course_id}/lectures/{lecture.pk}"
+        f"/assignments/{assignment.pk}/submissions/async/"
+    )
+    document = b"%PDF-1.4\n" + os.urandom(100 * 1024)
+
+    def submit(user):
+        client = APIClient()
+        client.force_authenticate(user)
+        upload = SimpleUploadedFile("work.pdf", document)
+        try:
+            start = time.perf_counter()
+            response = client.post(url, {"text": "My work", "files": [upload]})
+            elapsed = time.perf_counter() - start
+        finally:
+            connection.close()
+        assert response.status_code == 202, response.content
+        return elapsed
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return assignment, list(executor.map(submit, users))
+
+
+def drain(assignment):
+    from submissions.models import SubmissionIngestion
+
+    pending = SubmissionIngestion.objects.filter(
+        assignment=assignment,
+        status__in=[
+            SubmissionIngestion.Status.QUEUED,
+            SubmissionIngestion.Status.PROCESSING,
+        ],
+    )
+    while pending.exists():
+        time.sleep(0.05)
+    # sqlite fails some with "database is locked", one writer at a time
+    return SubmissionIngestion.objects.filter(
+        assignment=assignment, status=SubmissionIngestion.Status.FAILED
+    ).count()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    from django.test import override_settings
+
+    with test_database(), override_settings(MEDIA_ROOT=tempfile.mkdtemp()):
+        lecture, users = seed(args.students)
+        print(f"{args.students} submissions, {args.concurrency} at a time")
+
+        with mock.patch(
+            "submissions.ingestion.get_executor", return_value=InlineExecutor()
+        ):
+            start = time.perf_counter()
+            _, latencies = burst(lecture, users, args.concurrency, "Inline")
+            total = time.perf_counter() - start
+        print(f"on the request thread  {summary(latencies)}  all done {total:.1f} s")
+
+        start = time.perf_counter()
+        assignment, latencies = burst(lecture, users, args.concurrency, "Queued")
+        accepted = time.perf_counter() - start
+        failed = drain(assignment)
+        total = time.perf_counter() - start
+        print(
+            f"async endpoint         {summary(latencies)}  "
+            f"accepted {accepted:.1f} s, all done {total:.1f} s, {failed} failed"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import threading
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import CharField, Value
+from courses.models import Course, CourseTeacher, Enrollment
+
+# role stored for active enrollments, next to the CourseTeacher roles
+STUDENT_ROLE = "STUDENT"
+TEACHER_ROLES = {CourseTeacher.Role.OWNER, CourseTeacher.Role.CO_TEACHER}
+
+_cache_stats = {"hits": 0, "misses": 0}
+_cache_stats_lock = threading.Lock()
+
+
+def _version_key(user_id):
+    return f"course-membership:version:{user_id}"
+
+
+def _roles_key(user_id, version):
+    return f"course-membership:roles:{user_id}:{version}"
+
+
+def get_membership_version(user_id):
+    """
+    Current version stamp of a user's cached roles.
+
+    Stamps are random rather than a counter, so a version key that was evicted
+    can never be recreated with a value that still points to stale roles.
+    """
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_membership(*user_ids):
+    """
+    Drops the cached roles of the given users once the current transaction
+    commits, so a later request never reads roles the database no longer has.
+    """
+
+    def bump():
+        cache.set_many(
+            {_version_key(user_id): uuid.uuid4().hex for user_id in user_ids},
+            timeout=None,
+        )
+
+    if user_ids:
+        transaction.on_commit(bump)
+
+
+def membership_cache_stats():
+    with _cache_stats_lock:
+        return dict(_cache_stats)
+
+
+def _count(name):
+    with _cache_stats_lock:
+        _cache_stats[name] += 1
+
+
+def normalize_course_id(course_id):
+    try:
+        return int(course_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_course_id(obj):
+    """
+    Returns the id of the course an object belongs to
+    (course, lecture, assignment, submission, grade or grade comment).
+    """
+    if isinstance(obj, Course):
+        return obj.pk
+    if hasattr(obj, "course_id"):
+        return obj.course_id
+    if hasattr(obj, "lecture_id"):
+        return obj.lecture.course_id
+    if hasattr(obj, "assignment_id"):
+        return obj.assignment.lecture.course_id
+    if hasattr(obj, "submission_id"):
+        return get_course_id(obj.submission)
+    if hasattr(obj, "grade_id"):
+        return get_course_id(obj.grade)
+    return None
+
+
+def get_view_course_id(view):
+    """
+    Course id from the url kwargs. Nested routes use `course_pk`,
+    views can point to another kwarg with `course_lookup_kwarg`.
+    """
+    lookup_kwarg = getattr(view, "course_lookup_kwarg", "course_pk")
+    return normalize_course_id(view.kwargs.get(lookup_kwarg))
+
+
+class CourseMembership:
+    """
+    Course roles of one user.
+
+    Teacher and student memberships are loaded together with one query on first
+    use, so any number of permission checks in a request share that query.
+    With settings.MEMBERSHIP_CACHE the result is kept in the shared cache under
+    a per-user version stamp that the CourseTeacher and Enrollment signals bump
+    (see `invalidate_membership`).
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._roles = None
+        self._public_courses = {}
+
+    @property
+    def roles(self):
+        """
+        Maps course id to the set of the user's roles in it.
+        """
+        if self._roles is None:
+            self._roles = self.load_roles()
+        return self._roles
+
+    def load_roles(self):
+        if not self.user.is_authenticated:
+            return {}
+        if not settings.MEMBERSHIP_CACHE:
+            return self.query_roles()
+
+        key = _roles_key(self.user.pk, get_membership_version(self.user.pk))
+        roles = cache.get(key)
+        if roles is not None:
+            _count("hits")
+            return roles
+
+        _count("misses")
+        roles = self.query_roles()
+        cache.set(key, roles, timeout=settings.MEMBERSHIP_CACHE_TIMEOUT)
+        return roles
+
+    def query_roles(self):
+        teaching = CourseTeacher.objects.filter(teacher=self.user).values_list(
+            "course_id", "role"
+        )
+        studying = Enrollment.objects.filter(
+            student=self.user, is_active=True
+        ).values_list("course_id", Value(STUDENT_ROLE, output_field=CharField()))
+
+        roles = {}
+        for course_id, role in teaching.union(studying, all=True):
+            roles.setdefault(course_id, set()).add(role)
+        return roles
+
+    def course_roles(self, course_id):
+        return self.roles.get(normalize_course_id(course_id), set())
+
+    def is_teacher(self, course_id):
+        return bool(self.course_roles(course_id) & TEACHER_ROLES)
+
+    def is_owner(self, course_id):
+        return CourseTeacher.Role.OWNER in self.course_roles(course_id)
+
+    def is_student(self, course_id):
+        return STUDENT_ROLE in self.course_roles(course_id)
+
+    def is_public_course(self, course_id):
+        course_id = normalize_course_id(course_id)
+        if course_id not in self._public_courses:
+            self._public_courses[course_id] = Course.objects.filter(
+                pk=course_id, visibility=Course.Visibility.PUBLIC
+            ).exists()
+        return self._public_courses[course_id]
+
+
+def get_membership(request):
+    """
+    Returns the CourseMembership of the request user, memoized on the request.
+    """
+    membership = getattr(request, "_course_membership", None)
+    if membership is None or membership.user is not request.user:
+        membership = CourseMembership(request.user)
+        request._course_membership = membership
+    return membership
@@ -1,7 +1,10 @@
-from courses.models import Course, Enrollment, CourseTeacher
 from django.contrib.auth import get_user_model
 from rest_framework import permissions
-from lectures.models import Lecture
+from common.Permissions.membership import (
+    get_course_id,
+    get_membership,
+    get_view_course_id,
+)
 
 User = get_user_model()
 
@@ -9,69 +12,54 @@ User = get_user_model()
 class IsEnrolledStudentOrCourseTeacher(permissions.BasePermission):
     message = "You do not have permission to view this content."
 
-    def _check_permission(self, user, course):
-        if not user.is_authenticated:
+    def _check_permission(self, request, course_id):
+        user = request.user
+        if not user.is_authenticated or not course_id:
             return False
 
-        if course.visibility == Course.Visibility.PUBLIC:
-            return True
+        membership = get_membership(request)
 
-        if user.role == User.Role.TEACHER:
-            if CourseTeacher.objects.filter(teacher=user, course=course).exists():
-                return True
+        if user.role == User.Role.TEACHER and membership.is_teacher(course_id):
+            return True
 
-        if user.role == User.Role.STUDENT:
-            if Enrollment.objects.filter(
-                student=user, course=course, is_active=True
-            ).exists():
-                return True
+        if user.role == User.Role.STUDENT and membership.is_student(course_id):
+            return True
 
-        return False
+        return membership.is_public_course(course_id)
 
     def has_permission(self, request, view):
         # This method handles list views (e.g., /courses/{id}/lectures/)
         if not request.method in permissions.SAFE_METHODS:
             return False
 
-        course_id = view.kwargs.get("course_pk")
-        if not course_id:
-            return False
-
-        try:
-            course = Course.objects.get(id=course_id)
-        except Course.DoesNotExist:
-            return False
-
-        return self._check_permission(request.user, course)
+        return self._check_permission(request, get_view_course_id(view))
 
     def has_object_permission(self, request, view, obj):
         # This method handles detail views (e.g., /lectures/{id}/)
         if not request.method in permissions.SAFE_METHODS:
             return False
 
-        course = obj.course
-        if not course:
-            return False
-
-        return self._check_permission(request.user, course)
+        return self._check_permission(request, get_course_id(obj))
 
 
 class IsSubmissionOwnerOrCourseTeacher(permissions.BasePermission):
     message = "You do not have permission to view or modify this submission."
 
     def has_object_permission(self, request, view, obj):
+        # grades are checked through the submission they belong to
+        submission = getattr(obj, "submission", obj)
+        is_submission_owner = submission.student_id == request.user.id
 
         if (
             request.method in permissions.SAFE_METHODS
         ):  # SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
-            is_course_teacher = CourseTeacher.objects.filter(
-                course=obj.assignment.lecture.course, teacher=request.user
-            ).exists()
-            is_submission_owner = obj.student == request.user
+            is_course_teacher = get_membership(request).is_teacher(
+                get_course_id(submission)
+            )
             return is_course_teacher or is_submission_owner
 
         # Allow full access to submission owner
-        return obj.student == request.user
+        return is_submission_owner
 
 
 class IsCommentAuthor(permissions.BasePermission):
@@ -1,6 +1,6 @@
 from rest_framework import permissions
 from django.contrib.auth import get_user_model
-from courses.models import Enrollment
+from common.Permissions.membership import get_membership, get_view_course_id
 
 User = get_user_model()
 
@@ -20,10 +20,8 @@ class IsEnrolledStudent(permissions.BasePermission):
     """
 
     def has_permission(self, request, view):
-        course_id = view.kwargs.get("course_pk")
+        course_id = get_view_course_id(view)
         if not course_id:
             return False
 
-        return Enrollment.objects.filter(
-            course_id=course_id, student=request.user, is_active=True
-        ).exists()
+        return get_membership(request).is_student(course_id)
@@ -1,7 +1,10 @@
 from rest_framework import permissions
 from django.contrib.auth import get_user_model
-from courses.models import CourseTeacher
-from lectures.models import Lecture
+from common.Permissions.membership import (
+    get_course_id,
+    get_membership,
+    get_view_course_id,
+)
 
 User = get_user_model()
 
@@ -20,29 +23,22 @@ class IsCourseOwner(permissions.BasePermission):
         return (
             request.user.is_authenticated
             and request.user.role == User.Role.TEACHER
-            and CourseTeacher.objects.filter(
-                course=obj, teacher=request.user, role=CourseTeacher.Role.OWNER
-            ).exists()
+            and get_membership(request).is_owner(obj.pk)
         )
 
 
 # this permission is used to give students access to course content (every teacher can give access to course content)
 class IsCourseTeacher(permissions.BasePermission):
     def has_permission(self, request, view):
-        course_id = view.kwargs.get("course_pk")
+        course_id = get_view_course_id(view)
 
         if request.user.is_authenticated and request.user.role == User.Role.TEACHER:
-            return CourseTeacher.objects.filter(
-                teacher=request.user, course_id=course_id
-            ).exists()
+            return get_membership(request).is_teacher(course_id)
 
         return False
 
     def has_object_permission(self, request, view, obj):
         if request.user.is_authenticated and request.user.role == User.Role.TEACHER:
-            course = obj.course if isinstance(obj, Lecture) else obj.lecture.course
-            return CourseTeacher.objects.filter(
-                teacher=request.user, course=course
-            ).exists()
+            return get_membership(request).is_teacher(get_course_id(obj))
 
         return False
@@ -1,36 +1,124 @@
 from django.core.exceptions import ValidationError
 import magic
+import struct
 import zipfile
 from .base import BaseFileValidator
 
+# End of central directory record: signature, disk numbers, entry counts,
+# central directory size and offset, comment length (22 bytes + comment)
+_EOCD_SIGNATURE = b"PK\x05\x06"
+_EOCD_STRUCT = struct.Struct("<4s4H2LH")
+_EOCD_MAX_COMMENT = 0xFFFF
+_ZIP64_ENTRIES = 0xFFFF
+_ENCRYPTED_FLAG = 0x1
+
 
 class AdvancedFileValidator(BaseFileValidator):
-    def __init__(self, max_size=None, allowed_types=None, allowed_inner_types=None):
+    def __init__(
+        self,
+        max_size=None,
+        allowed_types=None,
+        allowed_inner_types=None,
+        max_entries=1000,
+        max_uncompressed_size=100 * 1024 * 1024,
+        max_compression_ratio=100,
+    ):
         super().__init__(max_size, allowed_types)
         self.allowed_inner_types = allowed_inner_types or []
+        self.max_entries = max_entries
+        self.max_uncompressed_size = max_uncompressed_size
+        self.max_compression_ratio = max_compression_ratio
 
     def validate_zip_contents(self, file):
-        if zipfile.is_zipfile(file):
+        """
+        Checks a zip archive in three cheap-to-expensive steps, stopping at the
+        first failure:
+
+        1. the entry count from the end of central directory record, before the
+           directory itself is parsed;
+        2. total uncompressed size and per entry compression ratio from the
+           central directory, before any member is decompressed;
+        3. the type of each member, sniffed from its first 2 KB. Every member
+           is read, the entry count cap bounds the cost.
+        """
+        if not zipfile.is_zipfile(file):
+            file.seek(0)
+            return
+
+        try:
+            self.validate_entry_count(file)
             with zipfile.ZipFile(file) as zf:
-                for name in zf.namelist():
-                    if name.endswith("/"):
-                        continue
-
-                    with zf.open(name) as inner_file:
-                        sample = inner_file.read(2048)
-                        mime = magic.from_buffer(sample, mime=True)
-
-                        if self.allowed_inner_types and not any(
-                            mime.startswith(t) for t in self.allowed_inner_types
-                        ):
-                            raise ValidationError(
-                                f"Invalid file inside zip: {name} "
-                                f"(MIME: {mime}). Allowed types are: {', '.join(self.allowed_inner_types)}"
-                            )
+                members = [info for info in zf.infolist() if not info.is_dir()]
+                self.validate_archive_limits(members)
+                if self.allowed_inner_types:
+                    self.validate_member_types(zf, members)
+        except (zipfile.BadZipFile, zipfile.LargeZipFile, EOFError):
+            raise ValidationError("The zip archive is corrupted.")
+        finally:
             file.seek(0)
 
-    def __call__(self, file):
-        super().__call__(file)
+    def validate_entry_count(self, file):
+        file.seek(0, 2)
+        size = file.tell()
+        tail_size = min(size, _EOCD_STRUCT.size + _EOCD_MAX_COMMENT)
+        file.seek(size - tail_size)
+        tail = file.read(tail_size)
+
+        position = tail.rfind(_EOCD_SIGNATURE)
+        if position < 0 or len(tail) - position < _EOCD_STRUCT.size:
+            raise ValidationError("The zip archive is corrupted.")
+
+        entries = _EOCD_STRUCT.unpack_from(tail, position)[4]
+        # zip64 archives store the real count elsewhere, the central directory
+        # check below still bounds them
+        if entries != _ZIP64_ENTRIES and entries > self.max_entries:
+            raise ValidationError(
+                f"The zip archive has too many entries (maximum {self.max_entries})."
+            )
+        file.seek(0)
+
+    def validate_archive_limits(self, members):
+        if len(members) > self.max_entries:
+            raise ValidationError(
+                f"The zip archive has too many entries (maximum {self.max_entries})."
+            )
+
+        total_size = 0
+        for info in members:
+            if info.flag_bits & _ENCRYPTED_FLAG:
+                raise ValidationError(
+                    f"Encrypted files are not allowed inside zip: {info.filename}"
+                )
+            if info.file_size > max(info.compress_size, 1) * self.max_compression_ratio:
+                raise ValidationError(
+                    f"File inside zip is compressed too much: {info.filename}"
+                )
+            total_size += info.file_size
+            if total_size > self.max_uncompressed_size:
+                raise ValidationError(
+                    f"Zip contents are bigger than "
+                    f"{self.max_uncompressed_size / (1024 * 1024)} MB uncompressed."
+                )
+
+    def validate_member_types(self, zf, members):
+        # verdicts are reused only for identical sampled bytes; the CRC and size
+        # in the central directory are whatever the uploader wrote there
+        verdicts = {}
+        for info in members:
+            with zf.open(info) as inner_file:
+                sample = inner_file.read(2048)
+            if sample not in verdicts:
+                verdicts[sample] = magic.from_buffer(sample, mime=True)
+            mime = verdicts[sample]
+
+            if not any(mime.startswith(t) for t in self.allowed_inner_types):
+                raise ValidationError(
+                    f"Invalid file inside zip: {info.filename} "
+                    f"(MIME: {mime}). Allowed types are: {', '.join(self.allowed_inner_types)}"
+                )
+
+    def validate_content(self, file):
+        super().validate_content(file)
         self.validate_zip_contents(file)
 
     def deconstruct(self):
@@ -42,5 +130,8 @@ class AdvancedFileValidator(BaseFileValidator):
                 "max_size": self.max_size,
                 "allowed_types": self.allowed_types,
                 "allowed_inner_types": self.allowed_inner_types,
+                "max_entries": self.max_entries,
+                "max_uncompressed_size": self.max_uncompressed_size,
+                "max_compression_ratio": self.max_compression_ratio,
             },
         )
@@ -1,5 +1,9 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+import hashlib
 import magic
+from common.utils.hashing import content_hash
 
 
 class BaseFileValidator:
@@ -9,8 +13,38 @@ class BaseFileValidator:
 
     def __call__(self, file):
         self.validate_size(file)
+        self.validate_cached(file)
+
+    def validate_content(self, file):
+        """
+        Checks that depend only on the file content. Subclasses extend this.
+        """
         self.validate_type(file)
 
+    def validate_cached(self, file):
+        """
+        Runs validate_content once per distinct content and validator settings.
+        The verdict (the error messages, empty when valid) is cached, so a file
+        uploaded again skips libmagic and the zip inspection.
+        """
+        key = self.cache_key(file)
+        messages = cache.get(key)
+        if messages is None:
+            try:
+                self.validate_content(file)
+            except ValidationError as e:
+                messages = e.messages
+            else:
+                messages = []
+            cache.set(key, messages, settings.FILE_VALIDATION_CACHE_TIMEOUT)
+
+        if messages:
+            raise ValidationError(messages)
+
+    def cache_key(self, file):
+        config = hashlib.sha256(repr(self.deconstruct()).encode()).hexdigest()[:16]
+        return f"file-validation:{config}:{content_hash(file)}"
+
     def validate_size(self, file):
         if self.max_size and file.size > self.max_size:
             raise ValidationError(
@@ -13,8 +13,8 @@ class ImageValidator(BaseFileValidator):
         self.max_width = max_width
         self.max_height = max_height
 
-    def __call__(self, file):
-        super().__call__(file)
+    def validate_content(self, file):
+        super().validate_content(file)
         self.validate_dimensions(file)
 
     def validate_dimensions(self, file):
@@ -3,9 +3,37 @@ import time
 import traceback
 import json
 from common.logging import logger
+from common.logging.query_metrics import QueryMetrics
 from django.db import connection
 
 
+class CountingStream:
+    """
+    Wraps a streaming response body and counts the bytes passing through it,
+    one chunk at a time, so file downloads keep streaming with flat memory.
+    `on_close` is called once with the total when the server closes the response.
+    """
+
+    def __init__(self, chunks, on_close):
+        self._chunks = iter(chunks)
+        self._on_close = on_close
+        self._closed = False
+        self.size = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = next(self._chunks)
+        self.size += len(chunk)
+        return chunk
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._on_close(self.size)
+
+
 class LoguruRequestMiddleware:
 
     def __init__(self, get_response):
@@ -29,77 +57,110 @@ class LoguruRequestMiddleware:
                 data["password"] = "***"
             request.logged_body = data
 
-        response = None
-        error = None
-        error_type = None
-        stacktrace = None
+        query_metrics = QueryMetrics()
 
         try:
-            response = self.get_response(request)
-            return response
+            with connection.execute_wrapper(query_metrics):
+                response = self.get_response(request)
         except Exception as e:
-            error = str(e)
-            error_type = type(e).__name__
-            stacktrace = traceback.format_exc()
+            self.log_request(
+                request,
+                None,
+                query_metrics,
+                response_size=0,
+                error=str(e),
+                error_type=type(e).__name__,
+                stacktrace=traceback.format_exc(),
+            )
             raise
-        finally:
-            duration_ms = int((time.time() - request.start_time) * 1000)
-            response_status = (
-                f"{response.status_code} - {response.reason_phrase}"
-                if response
-                else "N/A"
+
+        response_size = self.get_response_size(response)
+        if response_size is None:
+            # the size of a stream is only known once it has been sent,
+            # so the request is logged when the server closes the response
+            response.streaming_content = CountingStream(
+                response.streaming_content,
+                on_close=lambda size: self.log_request(
+                    request, response, query_metrics, response_size=size
+                ),
             )
-            response_size = (
-                len(response.content)
-                if response and hasattr(response, "content")
-                else 0
+        else:
+            self.log_request(
+                request, response, query_metrics, response_size=response_size
             )
-            content_type = response.get("Content-Type", None) if response else None
-
-            client_info = {
-                "client_ip": request.META.get("REMOTE_ADDR"),
-                "user_agent": request.META.get("HTTP_USER_AGENT"),
-                "reference": request.META.get("HTTP_REFERER"),
-            }
-            db_query_metrics = {
-                "num_queries": len(connection.queries),
-                "total_query_time_ms": sum(
-                    float(q["time"]) * 1000 for q in connection.queries
+        return response
+
+    def get_response_size(self, response):
+        """
+        Size of the response body without reading it, or None when it can only
+        be counted while streaming.
+        """
+        content_length = response.get("Content-Length")
+        if content_length is not None:
+            try:
+                return int(content_length)
+            except ValueError:
+                pass
+
+        if not response.streaming:
+            return len(response.content)
+
+        # async iterators are consumed by the ASGI handler, leave them alone
+        return 0 if response.is_async else None
+
+    def log_request(
+        self,
+        request,
+        response,
+        query_metrics,
+        response_size,
+        error=None,
+        error_type=None,
+        stacktrace=None,
+    ):
+        duration_ms = int((time.time() - request.start_time) * 1000)
+        response_status = (
+            f"{response.status_code} - {response.reason_phrase}" if response else "N/A"
+        )
+        content_type = response.get("Content-Type", None) if response else None
+
+        client_info = {
+            "client_ip": request.META.get("REMOTE_ADDR"),
+            "user_agent": request.META.get("HTTP_USER_AGENT"),
+            "reference": request.META.get("HTTP_REFERER"),
+        }
+        db_query_metrics = query_metrics.as_dict()
+
+        log = logger.bind(
+            request_id=request.request_id,
+            user={
+                "id": getattr(getattr(request, "user", None), "id", None),
+                "username": getattr(getattr(request, "user", None), "username", None),
+                "is_authenticated": getattr(
+                    getattr(request, "user", None), "is_authenticated", False
                 ),
-            }
-
-            log = logger.bind(
-                request_id=request.request_id,
-                user={
-                    "id": getattr(getattr(request, "user", None), "id", None),
-                    "username": getattr(
-                        getattr(request, "user", None), "username", None
-                    ),
-                    "is_authenticated": getattr(
-                        getattr(request, "user", None), "is_authenticated", False
-                    ),
-                },
-                view=getattr(request, "view_name", "unknown"),
-                function=getattr(request, "function_name", "unknown"),
-                input=getattr(request, "logged_body", {}),
-                duration_ms=duration_ms,
-                status_code=response_status,
-                response_size=response_size,
-                content_type=content_type,
-                client_info=client_info,
-                db_query_metrics=db_query_metrics,
-                error=error,
-                error_type=error_type,
-                stacktrace=stacktrace,
-            )
+            },
+            view=getattr(request, "view_name", "unknown"),
+            function=getattr(request, "function_name", "unknown"),
+            input=getattr(request, "logged_body", {}),
+            duration_ms=duration_ms,
+            status_code=response_status,
+            response_size=response_size,
+            content_type=content_type,
+            client_info=client_info,
+            db_query_metrics=db_query_metrics,
+            error=error,
+            error_type=error_type,
+            stacktrace=stacktrace,
+        )
 
-            log.info(
-                "Request finished",
-                event="REQUEST",
-                method=request.method,
-                path=request.path,
-                payload=request.logged_body,
-            )
+        log.info(
+            "Request finished",
+            event="REQUEST",
+            method=request.method,
+            path=request.path,
+            payload=getattr(request, "logged_body", {}),
+        )
 
     def process_view(self, request, view_func, view_args, view_kwargs):
         request.view_name = f"{view_func.__module__}.{view_func.__name__}"
@@ -1,33 +1,64 @@
 import os
-from pymongo import MongoClient
-from dotenv import load_dotenv
+import atexit
+import functools
+import queue
+import threading
+import time
 
-load_dotenv()
 
-MONGO_LOGGING = {
-    "HOST": os.getenv("MONGO_HOST", "mongo_logging"),
-    "PORT": int(os.getenv("MONGO_PORT", 27017)),
-    "DB_NAME": os.getenv("MONGO_DB_NAME", "logs"),
-    "USER": os.getenv("MONGO_LOG_USER", "logger"),
-    "PASSWORD": os.getenv("MONGO_LOG_PASSWORD", "logger_pass"),
-    "COLLECTION": "app_logs",
-}
+@functools.lru_cache(maxsize=None)
+def get_mongo_config():
+    """
+    Reads the Mongo logging settings from the environment (and `.env`).
+    Called on the first log write, not at import time.
+    """
+    from dotenv import load_dotenv
 
-client = MongoClient(
-    host=MONGO_LOGGING["HOST"],
-    port=MONGO_LOGGING["PORT"],
-    username=MONGO_LOGGING["USER"],
-    password=MONGO_LOGGING["PASSWORD"],
-    authSource=MONGO_LOGGING["DB_NAME"],
-)
+    load_dotenv()
+    return {
+        "ENABLED": os.getenv("MONGO_LOGGING_ENABLED", "true").lower()
+        in ("1", "true", "yes", "on"),
+        "HOST": os.getenv("MONGO_HOST", "mongo_logging"),
+        "PORT": int(os.getenv("MONGO_PORT", 27017)),
+        "DB_NAME": os.getenv("MONGO_DB_NAME", "logs"),
+        "USER": os.getenv("MONGO_LOG_USER", "logger"),
+        "PASSWORD": os.getenv("MONGO_LOG_PASSWORD", "logger_pass"),
+        "COLLECTION": "app_logs",
+        # an unreachable server must not stall the writer (or process exit) for long
+        "TIMEOUT_MS": int(os.getenv("MONGO_LOG_TIMEOUT_MS", 2000)),
+        # buffering of the background writer
+        "BATCH_SIZE": int(os.getenv("MONGO_LOG_BATCH_SIZE", 100)),
+        "FLUSH_INTERVAL": float(os.getenv("MONGO_LOG_FLUSH_INTERVAL", 1.0)),
+        "QUEUE_SIZE": int(os.getenv("MONGO_LOG_QUEUE_SIZE", 10000)),
+        # how long a log call may wait for room in a full queue before the record
+        # is dropped, 0 means drop immediately
+        "PUT_TIMEOUT": float(os.getenv("MONGO_LOG_PUT_TIMEOUT", 0)),
+    }
 
-collection = client[MONGO_LOGGING["DB_NAME"]][MONGO_LOGGING["COLLECTION"]]
 
+@functools.lru_cache(maxsize=None)
+def get_collection():
+    """
+    Creates the Mongo client on first use. pymongo is imported here, so processes
+    that never write a log record do not pay for it.
+    """
+    from pymongo import MongoClient
 
-def mongo_sink(message):
-    record = message.record
+    config = get_mongo_config()
+    client = MongoClient(
+        host=config["HOST"],
+        port=config["PORT"],
+        username=config["USER"],
+        password=config["PASSWORD"],
+        authSource=config["DB_NAME"],
+        serverSelectionTimeoutMS=config["TIMEOUT_MS"],
+    )
+    return client[config["DB_NAME"]][config["COLLECTION"]]
+
+
+def build_log_document(record):
     user = record["extra"].get("user") or {}
-    doc = {
+    return {
         "level": record["level"].name,
         "message": record["message"],
         "event": record["extra"].get("event"),
@@ -50,4 +81,173 @@ def mongo_sink(message):
         "input": record["extra"].get("payload", {}),
         "time": record["time"].isoformat(),
     }
-    collection.insert_one(doc)
+
+
+class BufferedMongoSink:
+    """
+    Loguru sink that never talks to Mongo on the caller's thread.
+
+    Records are put on a bounded queue and a background thread writes them
+    with `insert_many` once `batch_size` records are waiting or `flush_interval`
+    seconds have passed. When Mongo is slow and the queue is full, new records
+    wait at most `put_timeout` seconds and are then dropped, so request latency
+    does not depend on Mongo health. Whatever is still queued is flushed when
+    the process exits. A forked worker process starts with an empty queue and
+    its own writer thread.
+
+    The collection is obtained from `collection_factory` on the writer thread,
+    so creating the client never blocks a request either.
+    """
+
+    def __init__(
+        self,
+        collection_factory,
+        batch_size=100,
+        flush_interval=1.0,
+        queue_size=10000,
+        put_timeout=0,
+    ):
+        self.collection_factory = collection_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.put_timeout = put_timeout
+        self._reset()
+        atexit.register(self.close)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _reset(self):
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = os.getpid()
+        self._counters = {"queued": 0, "flushed": 0, "dropped": 0, "failed": 0}
+
+    def _after_fork(self):
+        # a forked worker (e.g. gunicorn --preload) gets none of the parent's
+        # threads, but copies of its queue and locks, possibly held by the
+        # parent's writer, and of the records the parent still has to write
+        self._reset()
+        # a MongoClient must not be shared with a forked child
+        getattr(self.collection_factory, "cache_clear", lambda: None)()
+
+    @property
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, pending=self._queue.qsize())
+
+    def __call__(self, message):
+        self._ensure_writer()
+        doc = build_log_document(message.record)
+        try:
+            if self.put_timeout > 0:
+                self._queue.put(doc, timeout=self.put_timeout)
+            else:
+                self._queue.put_nowait(doc)
+        except queue.Full:
+            self._count("dropped")
+        else:
+            self._count("queued")
+
+    def flush(self):
+        """
+        Writes everything that is queued right now on the calling thread.
+        """
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+        self.flush()
+
+    def _ensure_writer(self):
+        # the writer is started on the first record of each process
+        if self._pid != os.getpid():
+            # forked without register_at_fork
+            self._after_fork()
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="mongo-log-writer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        try:
+            self.collection_factory().insert_many(batch, ordered=False)
+        except Exception:
+            # anything, a connection error or a record bson cannot encode, must not
+            # end the writer thread. The records are lost; logging them through
+            # loguru would loop back here
+            self._count("failed", len(batch))
+        else:
+            self._count("flushed", len(batch))
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_sink():
+    """
+    Returns the process wide buffered sink, or None when Mongo logging is
+    turned off with MONGO_LOGGING_ENABLED.
+    """
+    global _sink
+    config = get_mongo_config()
+    if _sink is None and config["ENABLED"]:
+        with _sink_lock:
+            if _sink is None:
+                _sink = BufferedMongoSink(
+                    get_collection,
+                    batch_size=config["BATCH_SIZE"],
+                    flush_interval=config["FLUSH_INTERVAL"],
+                    queue_size=config["QUEUE_SIZE"],
+                    put_timeout=config["PUT_TIMEOUT"],
+                )
+    return _sink
+
+
+def mongo_sink(message):
+    sink = get_sink()
+    if sink is not None:
+        sink(message)
@@ -0,0 +1,66 @@
+import heapq
+import re
+import time
+
+_STRING_LITERALS = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERALS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint_sql(sql):
+    """
+    Normalizes a statement so queries that differ only in their parameters
+    (literals, placeholders, length of an IN list) get the same text.
+    """
+    sql = _STRING_LITERALS.sub("?", sql)
+    sql = _NUMBER_LITERALS.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _PLACEHOLDER_LISTS.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+class QueryMetrics:
+    """
+    Database execute wrapper that counts queries and their total time and keeps
+    the `slowest` statements of a request.
+
+    Unlike `connection.queries` it works with DEBUG off and does not keep every
+    statement around. Statements are only fingerprinted when the report is built,
+    so the cost per query is a timer call and a heap comparison.
+
+    Usage:
+        metrics = QueryMetrics()
+        with connection.execute_wrapper(metrics):
+            ...
+        metrics.as_dict()
+    """
+
+    def __init__(self, slowest=5):
+        self.slowest = slowest
+        self.count = 0
+        self.total_time = 0.0
+        self._slowest = []  # min-heap of (duration, sequence, sql)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.total_time += duration
+            if len(self._slowest) < self.slowest:
+                heapq.heappush(self._slowest, (duration, self.count, sql))
+            elif duration > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, (duration, self.count, sql))
+
+    def as_dict(self):
+        return {
+            "num_queries": self.count,
+            "total_query_time_ms": self.total_time * 1000,
+            "slowest_queries": [
+                {"sql": fingerprint_sql(sql), "time_ms": duration * 1000}
+                for duration, _, sql in sorted(self._slowest, reverse=True)
+            ],
+        }
@@ -1,6 +1,7 @@
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 from rest_framework_simplejwt.views import TokenObtainPairView
+from users.serializers import CustomTokenObtainPairSerializer
 
 
 class BaseAPIView(APIView):
@@ -37,6 +38,7 @@ class BaseViewSet(GenericViewSet, BaseAPIView):
 class CustomTokenObtainPairView(BaseAPIView, TokenObtainPairView):
     """
     This is for login view to add logging.
+    The tokens carry the user's role, see CustomTokenObtainPairSerializer.
     """
 
-    pass
+    serializer_class = CustomTokenObtainPairSerializer
@@ -0,0 +1,56 @@
+from rest_framework.pagination import CursorPagination
+
+
+class BaseCursorPagination(CursorPagination):
+    """
+    Keyset pagination for list endpoints.
+
+    Pages are fetched with `WHERE <ordering field> < cursor LIMIT page_size`
+    instead of OFFSET, so deep pages cost the same as the first one and a
+    request never holds more than `max_page_size` rows.
+    Clients may ask for a smaller or bigger page with `?page_size=`.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = "-created_at"
+
+
+class CoursePagination(BaseCursorPagination):
+    ordering = "-created_at"
+
+
+# lectures are always listed inside one course, so `order` alone is enough
+# for the cursor and is served by the (course, order) index
+class LecturePagination(BaseCursorPagination):
+    ordering = "order"
+    max_page_size = 200
+
+
+class HomeworkAssignmentPagination(BaseCursorPagination):
+    ordering = "created_at"
+
+
+class SubmissionPagination(BaseCursorPagination):
+    ordering = "-submitted_at"
+    page_size = 50
+    max_page_size = 200
+
+
+class GradePagination(BaseCursorPagination):
+    ordering = "-graded_at"
+
+
+class GradeCommentPagination(BaseCursorPagination):
+    ordering = "created_at"
+
+
+class CourseTeacherPagination(BaseCursorPagination):
+    ordering = "created_at"
+
+
+class EnrollmentPagination(BaseCursorPagination):
+    ordering = "-joined_at"
+    page_size = 50
+    max_page_size = 500
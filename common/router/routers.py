@@ -4,7 +4,12 @@ from rest_framework_nested import routers
 #  Base router
 from courses.views import CourseViewSet
 from lectures.views import LectureViewSet, HomeworkAssignmentViewSet
-from submissions.views import SubmissionViewSet, GradeViewSet, GradeCommentViewSet
+from submissions.views import (
+    SubmissionViewSet,
+    UploadSessionViewSet,
+    GradeViewSet,
+    GradeCommentViewSet,
+)
 
 router = DefaultRouter()
 router.register(r"courses", CourseViewSet, basename="course")
@@ -24,6 +29,7 @@ submissions_router.register(r"submissions", SubmissionViewSet, basename="assignm
 #  Nested: grades under submissions
 grades_router = routers.NestedSimpleRouter(submissions_router, r"submissions", lookup="submission")
 grades_router.register(r"grades", GradeViewSet, basename="submission-grades")
+grades_router.register(r"uploads", UploadSessionViewSet, basename="submission-uploads")
 
 # Nested: comments under grades
 comments_router = routers.NestedSimpleRouter(grades_router, r"grades", lookup="grade")
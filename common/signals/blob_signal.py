@@ -0,0 +1,56 @@
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from common.storage.content_addressed import ContentAddressedStorage
+
+
+def release_blobs(model, *field_names):
+    """
+    Registers signals for the given model that release the content-addressed
+    blobs its file fields point to, when the row is deleted and when a file is
+    replaced by another. A blob shared with other rows stays, the last row
+    dropping it removes it.
+
+    Args:
+        model: The model class owning the file fields.
+        field_names: Names of FileFields stored in ContentAddressedStorage.
+    """
+
+    def release(name, file_name):
+        storage = model._meta.get_field(name).storage
+        if file_name and isinstance(storage, ContentAddressedStorage):
+            # checked after commit, when the change is visible
+            transaction.on_commit(partial(storage.release_blob, file_name))
+
+    def _snapshot_handler(sender, instance, **kwargs):
+        # the names as loaded or last saved, deferred fields are left out
+        instance._blob_names = {
+            name: str(instance.__dict__[name] or "")
+            for name in field_names
+            if name in instance.__dict__
+        }
+
+    def _save_handler(sender, instance, created, **kwargs):
+        for name in field_names:
+            file = getattr(instance, name)
+            if file and isinstance(file.storage, ContentAddressedStorage):
+                file.storage.settle(file.name)
+            if not created and name in instance._blob_names:
+                if str(file or "") != instance._blob_names[name]:
+                    release(name, instance._blob_names[name])
+        _snapshot_handler(sender, instance)
+
+    def _delete_handler(sender, instance, **kwargs):
+        for name in field_names:
+            release(name, str(getattr(instance, name) or ""))
+
+    label = model._meta.label_lower
+    post_init.connect(
+        _snapshot_handler, sender=model, weak=False, dispatch_uid=f"blobs-init-{label}"
+    )
+    post_save.connect(
+        _save_handler, sender=model, weak=False, dispatch_uid=f"blobs-save-{label}"
+    )
+    post_delete.connect(
+        _delete_handler, sender=model, weak=False, dispatch_uid=f"blobs-delete-{label}"
+    )
@@ -0,0 +1,33 @@
+from django.db.models.signals import post_delete, post_save
+from common.Permissions.membership import invalidate_membership
+
+
+def invalidate_membership_on_change(model, user_field):
+    """
+
+    Registers post_save and post_delete signals for the given model to drop the
+    cached course roles of the user the changed row belongs to.
+
+
+    Args:
+        model: The membership model class (CourseTeacher or Enrollment).
+        user_field: The attribute holding the user id (e.g. 'teacher_id').
+    """
+
+    def _membership_handler(sender, instance, **kwargs):
+        invalidate_membership(getattr(instance, user_field))
+
+    # the handler is local to this function, a weak reference would let it be collected
+    label = model._meta.label_lower
+    post_save.connect(
+        _membership_handler,
+        sender=model,
+        weak=False,
+        dispatch_uid=f"membership-save-{label}",
+    )
+    post_delete.connect(
+        _membership_handler,
+        sender=model,
+        weak=False,
+        dispatch_uid=f"membership-delete-{label}",
+    )
@@ -1,39 +1,57 @@
-from django.db.models.signals import pre_save
-from django.dispatch import receiver
-from common.utils.slugify import generate_unique_slug
+from django.db.models.signals import post_init, post_save, pre_save
+from common.utils.slugify import DEFERRED, generate_unique_slug, slug_is_stale
 
 
-def auto_generate_slug(model, source_field, slug_field="slug"):
+def auto_generate_slug(model, source_field, slug_field="slug", scope_fields=()):
     """
 
     Registers a pre_save signal for the given model to auto-generate a unique slug
-    based on a specified field.
+    based on a specified field. The field's value is remembered when an instance
+    is loaded, saved or refreshed, so saves that leave it unchanged (or that
+    pass update_fields without it) cost no extra query.
 
 
     Args:
         model: The model class to which the slug generation should be applied.
         source_field: The field of the instance to base the slug on.
         slug_field: The field in the model where the slug is stored (default is 'slug').
+        scope_fields: Fields the slug is unique together with, e.g. ('course',)
+            for a slug unique per course (default is unique across the table).
     """
 
-    @receiver(pre_save, sender=model)
-    def _slug_handler(sender, instance, **kwargs):
-        regenerate = False
+    # read by SlugRetryMixin
+    model._slug_settings = {
+        "source_field": source_field,
+        "slug_field": slug_field,
+        "scope_fields": scope_fields,
+    }
 
-        if not instance.pk:
-            regenerate = True
+    def _snapshot_handler(sender, instance, **kwargs):
+        # the source value as loaded (or last saved), compared on the next save
+        # instead of fetching the row again; missing when the field is deferred
+        instance._slug_source_snapshot = instance.__dict__.get(source_field, DEFERRED)
 
-        else:
-            try:
-                old_instance = sender.objects.get(pk=instance.pk)
-                if getattr(old_instance, source_field) != getattr(
-                    instance, source_field
-                ):
-                    regenerate = True
-            except sender.DoesNotExist:
-                regenerate = True
+    def _saved_handler(sender, instance, update_fields=None, **kwargs):
+        if update_fields is None or source_field in update_fields:
+            _snapshot_handler(sender, instance)
 
-        if regenerate or not getattr(instance, slug_field, None):
+    def _slug_handler(sender, instance, update_fields=None, **kwargs):
+        if slug_is_stale(instance, source_field, slug_field, update_fields):
             generate_unique_slug(
-                instance, model, source_field=source_field, slug_field=slug_field
+                instance,
+                model,
+                source_field=source_field,
+                slug_field=slug_field,
+                scope_fields=scope_fields,
             )
+
+    label = model._meta.label_lower
+    post_init.connect(
+        _snapshot_handler, sender=model, weak=False, dispatch_uid=f"slug-init-{label}"
+    )
+    pre_save.connect(
+        _slug_handler, sender=model, weak=False, dispatch_uid=f"slug-{label}"
+    )
+    post_save.connect(
+        _saved_handler, sender=model, weak=False, dispatch_uid=f"slug-saved-{label}"
+    )
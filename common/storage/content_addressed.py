@@ -0,0 +1,210 @@
+import hashlib
+import os
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from functools import partial
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, models, transaction
+from django.utils.deconstruct import deconstructible
+
+_local_lock = threading.Lock()
+_local = threading.local()
+
+
+def _unsaved_pins():
+    # pins taken outside a transaction by this thread, by blob name
+    if not hasattr(_local, "pins"):
+        _local.pins = {}
+    return _local.pins
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that keeps each distinct content once, under
+    `blobs/<aa>/<bb>/<sha256><ext>` in MEDIA_ROOT.
+
+    Uploads are copied to a temporary file while being hashed (one pass over
+    the data) and then renamed to their blob name. When the content hash is
+    already known (the validators compute it) and the blob exists, nothing is
+    written at all. Every row uploading the same file stores the same name, a
+    blob is removed only when the last of them is deleted (see release_blob)
+    and no save still pins it (see pin).
+
+    Blobs are plain immutable files under MEDIA_ROOT, so they are served the
+    same way as before (the web server or FileResponse, both with sendfile).
+    """
+
+    blob_dir = "blobs"
+
+    def get_available_name(self, name, max_length=None):
+        # the stored name is decided by the content in _save, not by upload_to
+        return name
+
+    def blob_name(self, digest, name):
+        extension = os.path.splitext(name)[1].lower()
+        return f"{self.blob_dir}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+    def _save(self, name, content):
+        digest = getattr(content, "content_sha256", None)
+        if digest is not None and self.pin(self.blob_name(digest, name)):
+            return self.blob_name(digest, name)
+
+        tmp_dir = self.path(f"{self.blob_dir}/tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            hasher = hashlib.sha256()
+            with os.fdopen(fd, "wb") as tmp_file:
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    tmp_file.write(chunk)
+
+            blob = self.blob_name(hasher.hexdigest(), name)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+            self.pin(blob, tmp_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return blob
+
+    def pin(self, blob, tmp_path=None):
+        """
+        Keeps `blob` from being released until the row storing it is committed.
+        A missing blob is moved into place from `tmp_path`; without one, False
+        is returned and nothing is pinned.
+
+        The pin is a file under `blobs/pins/`, removed once the transaction
+        commits, or outside a transaction once the row is saved (settle). If
+        the save fails it stays until release_stale_pins, which then releases
+        the blob if nothing uses it.
+        """
+        with self.blob_lock(blob):
+            if not self.exists(blob):
+                if tmp_path is None:
+                    return False
+                os.makedirs(os.path.dirname(self.path(blob)), exist_ok=True)
+                os.replace(tmp_path, self.path(blob))
+            pin_dir = self.path(self.pin_dir(blob))
+            os.makedirs(pin_dir, exist_ok=True)
+            pin = os.path.join(pin_dir, uuid.uuid4().hex)
+            open(pin, "x").close()
+
+        if connection.in_atomic_block:
+            transaction.on_commit(partial(self.unpin, blob, pin))
+        else:
+            # the row is committed by its own INSERT, see settle
+            _unsaved_pins().setdefault(blob, []).append(pin)
+        return True
+
+    def settle(self, blob):
+        """
+        Removes the pins this thread took on `blob` outside a transaction.
+        Called once the row storing it is saved.
+        """
+        for pin in _unsaved_pins().pop(blob, []):
+            if connection.in_atomic_block:
+                transaction.on_commit(partial(self.unpin, blob, pin))
+            else:
+                self.unpin(blob, pin)
+
+    def unpin(self, blob, pin):
+        with self.blob_lock(blob):
+            if os.path.exists(pin):
+                os.remove(pin)
+            try:
+                os.rmdir(os.path.dirname(pin))
+            except OSError:
+                # another save still pins the blob
+                pass
+
+    def pin_dir(self, blob):
+        return f"{self.blob_dir}/pins/{os.path.basename(blob)}"
+
+    @contextmanager
+    def blob_lock(self, blob):
+        """
+        Serializes pinning and releasing one blob across workers, so a release
+        cannot delete a blob between a save finding it and pinning it.
+        """
+        if connection.vendor != "postgresql":
+            # sqlite and the other development databases serve one process
+            with _local_lock:
+                yield
+            return
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(hashtextextended(%s, 0))", [blob])
+            try:
+                yield
+            finally:
+                cursor.execute(
+                    "SELECT pg_advisory_unlock(hashtextextended(%s, 0))", [blob]
+                )
+
+    def is_referenced(self, name):
+        """
+        Whether any row still stores `name`. Stops at the first field that
+        has one; the file columns are indexed, so each check is an index probe.
+        """
+        return any(
+            model._default_manager.filter(**{field.name: name}).exists()
+            for model, field in self.referencing_fields()
+        )
+
+    def referencing_fields(self):
+        return [
+            (model, field)
+            for model in apps.get_models()
+            for field in model._meta.concrete_fields
+            if isinstance(field, models.FileField)
+            and isinstance(field.storage, ContentAddressedStorage)
+            and field.storage.location == self.location
+        ]
+
+    def release_blob(self, name):
+        """
+        Deletes the blob once no row references it and no save pins it.
+        Files uploaded before this storage was introduced are left alone.
+        """
+        if not name or not name.startswith(f"{self.blob_dir}/"):
+            return
+        with self.blob_lock(name):
+            if os.path.isdir(self.path(self.pin_dir(name))):
+                return
+            if not self.is_referenced(name):
+                self.delete(name)
+
+    def release_stale_pins(self, older_than):
+        """
+        Removes the pins created before `older_than`, a timestamp, and releases
+        their blobs. Returns the number of pins removed.
+        """
+        pins_dir = self.path(f"{self.blob_dir}/pins")
+        if not os.path.isdir(pins_dir):
+            return 0
+        count = 0
+        for blob_file in os.listdir(pins_dir):
+            digest = os.path.splitext(blob_file)[0]
+            blob = self.blob_name(digest, blob_file)
+            pin_dir = os.path.join(pins_dir, blob_file)
+            with self.blob_lock(blob):
+                # the directory goes away when its last pin is removed on commit
+                if not os.path.isdir(pin_dir):
+                    continue
+                stale = [
+                    entry.path
+                    for entry in os.scandir(pin_dir)
+                    if entry.stat().st_mtime < older_than
+                ]
+            for pin in stale:
+                self.unpin(blob, pin)
+            count += len(stale)
+            self.release_blob(blob)
+        return count
+
+
+blob_storage = ContentAddressedStorage()
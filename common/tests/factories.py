@@ -0,0 +1,28 @@
+from itertools import count
+from django.contrib.auth import get_user_model
+from courses.models import Course, CourseTeacher
+from lectures.models import HomeworkAssignment, Lecture
+
+User = get_user_model()
+
+_emails = count()
+
+
+def make_user(role):
+    return User.objects.create_user(f"user{next(_emails)}@example.com", role=role)
+
+
+def make_assignment(owner=None, **fields):
+    """
+    A homework assignment in a new course and lecture. `owner` (a new teacher
+    by default) is the course's owning teacher.
+    """
+    owner = owner or make_user(User.Role.TEACHER)
+    course = Course.objects.create(title="Course", created_by=owner)
+    CourseTeacher.objects.create(
+        course=course, teacher=owner, role=CourseTeacher.Role.OWNER
+    )
+    lecture = Lecture.objects.create(course=course, title="Lecture")
+    return HomeworkAssignment.objects.create(
+        lecture=lecture, title="Homework", **fields
+    )
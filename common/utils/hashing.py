@@ -0,0 +1,26 @@
+import hashlib
+
+CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(file, chunk_size=CHUNK_SIZE):
+    """
+    Returns the sha256 hex digest of a file's content, read in chunks so large
+    uploads are never held in memory.
+
+    The digest is remembered on the file object (`content_sha256`), so the
+    validators and the storage do not hash the same upload twice.
+    """
+    digest = getattr(file, "content_sha256", None)
+    if digest is not None:
+        return digest
+
+    hasher = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b""):
+        hasher.update(chunk)
+    file.seek(0)
+    digest = hasher.hexdigest()
+
+    file.content_sha256 = digest
+    return digest
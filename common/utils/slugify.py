@@ -1,30 +1,133 @@
+import re
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Cast, Length, Substr
 from django.utils.text import slugify
 
+SLUG_ATTEMPTS = 5
+# room kept at the end of the slug for a "-<number>" suffix
+SUFFIX_RESERVE = 10
+# stands for a source field that was not loaded
+DEFERRED = object()
+
 
 def generate_unique_slug(
-    instance, model, source_field, slug_field="slug", slugify_func=slugify
+    instance,
+    model,
+    source_field,
+    slug_field="slug",
+    slugify_func=slugify,
+    scope_fields=(),
 ):
     """
     Generates a unique slug for a given instance based on the ather field.
 
+    The base slug is used when it is free, otherwise the highest `-<number>`
+    suffix in use plus one. Both are found with a single query. Uniqueness is
+    finally enforced by the database, see SlugRetryMixin.
+
     Args:
         instance: The model instance for which to generate the slug.
         model: The model class to check for uniqueness.
         field: The field of the instance to base the slug on (e.g., 'title').
         slug_field: The field in the model where the slug is stored (default is 'slug').
         slugify_func: The function used to create the slug (default is Django's slugify).
+        scope_fields: Fields the slug is unique together with (e.g. ('course',)).
     """
     base_value = getattr(instance, source_field)
     if not base_value:
         raise ValueError(f"Cannot generate slug: '{source_field}' is empty.")
-    base_slug = slugify_func(base_value)
-    slug = base_slug
-    unique_suffix = 1
+    max_length = model._meta.get_field(slug_field).max_length
+    base_slug = slugify_func(base_value)[: max_length - SUFFIX_RESERVE]
 
-    qs = model.objects.exclude(pk=instance.pk) if instance.pk else model.objects.all()
+    suffix_start = len(base_slug) + 2
+    # the prefix filter lets postgres scan the slug's varchar_pattern_ops index
+    candidates = slug_queryset(instance, model, scope_fields).filter(
+        **{f"{slug_field}__startswith": base_slug}
+    )
+    taken = candidates.aggregate(
+        exact=models.Count("pk", filter=models.Q(**{slug_field: base_slug})),
+        max_suffix=models.Max(
+            Cast(
+                Substr(slug_field, suffix_start, Length(slug_field)),
+                models.BigIntegerField(),
+            ),
+            filter=models.Q(
+                **{f"{slug_field}__regex": rf"^{re.escape(base_slug)}-[0-9]{{1,9}}$"}
+            ),
+        ),
+    )
 
-    while qs.filter(**{slug_field: slug}).exists():
-        slug = f"{base_slug}-{unique_suffix}"
-        unique_suffix += 1
+    slug = base_slug
+    if taken["exact"]:
+        slug = f"{base_slug}-{(taken['max_suffix'] or 0) + 1}"
 
     setattr(instance, slug_field, slug)
+
+
+def slug_is_stale(instance, source_field, slug_field, update_fields=None):
+    """
+    Whether saving `instance` generates its slug: it is new, has no slug, or its
+    source value changed since it was loaded or last saved. Saves whose
+    update_fields leave out the source field never do.
+    """
+    if update_fields is not None and source_field not in update_fields:
+        return False
+    return (
+        instance._state.adding
+        or instance.__dict__.get(source_field, DEFERRED)
+        != getattr(instance, "_slug_source_snapshot", DEFERRED)
+        or not getattr(instance, slug_field, None)
+    )
+
+
+def slug_queryset(instance, model, scope_fields=()):
+    """
+    Rows the slug of `instance` must differ from: same scope, other pk.
+    """
+    attnames = [model._meta.get_field(name).attname for name in scope_fields]
+    scope = {attname: getattr(instance, attname) for attname in attnames}
+    qs = model._default_manager.filter(**scope)
+    return qs.exclude(pk=instance.pk) if instance.pk else qs
+
+
+class SlugRetryMixin:
+    """
+    Model mixin for models registered with auto_generate_slug. Two concurrent
+    saves can pick the same free slug, the loser gets an IntegrityError from the
+    unique constraint; the save is then retried and the slug picked again.
+    Saves that keep the slug run as they are, without a savepoint.
+    """
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using, fields, from_queryset)
+        # the reloaded value is what the next save compares against
+        source_field = self._slug_settings["source_field"]
+        if fields is None or source_field in fields:
+            self._slug_source_snapshot = self.__dict__.get(source_field, DEFERRED)
+
+    def save(self, *args, **kwargs):
+        settings = self._slug_settings
+        update_fields = kwargs.get("update_fields")
+        if not slug_is_stale(
+            self, settings["source_field"], settings["slug_field"], update_fields
+        ):
+            # the slug is kept, it cannot collide and needs no savepoint
+            return super().save(*args, **kwargs)
+
+        if update_fields is not None:
+            # a new title means a new slug, which has to be written too
+            kwargs["update_fields"] = {*update_fields, settings["slug_field"]}
+        for attempt in range(1, SLUG_ATTEMPTS + 1):
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                slug = getattr(self, settings["slug_field"])
+                taken = (
+                    slug_queryset(self, type(self), settings["scope_fields"])
+                    .filter(**{settings["slug_field"]: slug})
+                    .exists()
+                )
+                if attempt == SLUG_ATTEMPTS or not taken:
+                    raise
+                setattr(self, settings["slug_field"], "")
@@ -7,6 +7,9 @@ class CoursesConfig(AppConfig):
 
     def ready(self):
         from common.signals.slug_signal import auto_generate_slug
-        from .models import Course
+        from common.signals.membership_signal import invalidate_membership_on_change
+        from .models import Course, CourseTeacher, Enrollment
 
         auto_generate_slug(Course, source_field="title", slug_field="slug")
+        invalidate_membership_on_change(CourseTeacher, user_field="teacher_id")
+        invalidate_membership_on_change(Enrollment, user_field="student_id")
@@ -1,10 +1,63 @@
 from django.db import models
+from common.utils.slugify import SlugRetryMixin
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 
-class Course(models.Model):
+class CourseQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Courses the given user is allowed to see.
+
+        Anonymous users see public courses, teachers additionally see the courses
+        they teach and students the courses they are actively enrolled in.
+        Membership is checked with a correlated EXISTS instead of a join, so every
+        course comes back once and no DISTINCT is needed.
+        """
+        public = models.Q(visibility=Course.Visibility.PUBLIC)
+
+        if not user.is_authenticated:
+            return self.filter(public)
+
+        if user.role == User.Role.TEACHER:
+            membership = CourseTeacher.objects.filter(
+                course=models.OuterRef("pk"), teacher=user
+            )
+        elif user.role == User.Role.STUDENT:
+            membership = Enrollment.objects.filter(
+                course=models.OuterRef("pk"), student=user, is_active=True
+            )
+        else:
+            return self.none()
+
+        return self.filter(public | models.Exists(membership))
+
+    def with_teachers(self):
+        """
+        Prefetches course teachers together with their user rows,
+        so nested teacher serialization costs one query for the whole page.
+        """
+        return self.prefetch_related(
+            models.Prefetch(
+                "course_teachers",
+                queryset=CourseTeacher.objects.select_related("teacher"),
+            )
+        )
+
+    def with_enrollments(self):
+        """
+        Prefetches enrollments together with their student rows in a single query.
+        """
+        return self.prefetch_related(
+            models.Prefetch(
+                "enrollments",
+                queryset=Enrollment.objects.select_related("student"),
+            )
+        )
+
+
+class Course(SlugRetryMixin, models.Model):
     class Visibility(models.TextChoices):
         PUBLIC = "PUBLIC", "Public"
         PRIVATE = "PRIVATE", "Private"
@@ -43,6 +96,8 @@ class Course(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CourseQuerySet.as_manager()
+
     class Meta:
         verbose_name = "course"
         verbose_name_plural = "courses"
@@ -15,7 +15,7 @@ class CourseTeacherSerializer(serializers.ModelSerializer):
 
 
 class EnrollmentSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+    student = UserSerializer(read_only=True)
 
     class Meta:
         model = Enrollment
@@ -0,0 +1,132 @@
+import csv
+import io
+from collections import Counter
+from itertools import islice
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from common.Permissions.membership import invalidate_membership
+from .models import Enrollment
+
+User = get_user_model()
+
+BULK_ENROLL_BATCH_SIZE = 1000
+BULK_ENROLL_MAX_ROWS = 10000
+
+
+def is_user_id(value):
+    # str.isdigit() also accepts digits int() cannot parse, such as "²"
+    return value.isascii() and value.isdigit()
+
+
+class EnrollmentService:
+    @staticmethod
+    def bulk_enroll(course, identifiers, added_by):
+        """
+        Enrolls students given by id or email as accepted, active members.
+
+        Identifiers are resolved BULK_ENROLL_BATCH_SIZE at a time: one query for the users,
+        one for their existing enrollments, one bulk insert of the new rows and
+        one update for pending or removed enrollments being accepted. Returns a
+        report with one result per input row.
+        """
+        results = []
+        seen = set()
+        enrolled_ids = []
+        with transaction.atomic():
+            rows = enumerate(identifiers, start=1)
+            while batch := list(islice(rows, BULK_ENROLL_BATCH_SIZE)):
+                if batch[-1][0] > BULK_ENROLL_MAX_ROWS:
+                    raise ValidationError(
+                        f"At most {BULK_ENROLL_MAX_ROWS} students can be enrolled at once."
+                    )
+                results.extend(
+                    EnrollmentService._enroll_batch(
+                        course, batch, added_by, seen, enrolled_ids
+                    )
+                )
+            # bulk_create and update() send no signals, drop the cached roles here
+            invalidate_membership(*enrolled_ids)
+
+        return {
+            "summary": dict(Counter(result["result"] for result in results)),
+            "results": results,
+        }
+
+    @staticmethod
+    def _enroll_batch(course, batch, added_by, seen, enrolled_ids):
+        values = [(row, str(value).strip()) for row, value in batch]
+        ids = {int(value) for _, value in values if is_user_id(value)}
+        emails = {
+            User.objects.normalize_email(value) for _, value in values if "@" in value
+        }
+        users = list(
+            User.objects.filter(
+                models.Q(id__in=ids) | models.Q(email__in=emails)
+            ).values("id", "email", "role")
+        )
+        by_id = {user["id"]: user for user in users}
+        by_email = {user["email"]: user for user in users}
+        existing = dict(
+            Enrollment.objects.filter(course=course, student_id__in=by_id).values_list(
+                "student_id", "is_active"
+            )
+        )
+
+        results, to_create, to_accept = [], [], []
+        for row, value in values:
+            if is_user_id(value):
+                user = by_id.get(int(value))
+            else:
+                user = by_email.get(User.objects.normalize_email(value))
+
+            if user is None:
+                result = "not_found"
+            elif user["role"] != User.Role.STUDENT:
+                result = "not_a_student"
+            elif user["id"] in seen:
+                result = "duplicate"
+            elif existing.get(user["id"]):
+                result = "already_enrolled"
+            elif user["id"] in existing:
+                result = "accepted"
+                to_accept.append(user["id"])
+            else:
+                result = "enrolled"
+                to_create.append(
+                    Enrollment(
+                        course=course,
+                        student_id=user["id"],
+                        status=Enrollment.Status.ACCEPTED,
+                        is_active=True,
+                        added_by=added_by,
+                    )
+                )
+            if result in ("enrolled", "accepted", "already_enrolled"):
+                seen.add(user["id"])
+            results.append({"row": row, "value": value, "result": result})
+
+        # a concurrent enroll of the same student keeps its row
+        Enrollment.objects.bulk_create(to_create, ignore_conflicts=True)
+        if to_accept:
+            Enrollment.objects.filter(course=course, student_id__in=to_accept).update(
+                status=Enrollment.Status.ACCEPTED, is_active=True, removed_at=None
+            )
+        enrolled_ids.extend(enrollment.student_id for enrollment in to_create)
+        enrolled_ids.extend(to_accept)
+        return results
+
+    @staticmethod
+    def read_identifiers(upload):
+        """
+        Yields the first cell of every CSV row, read line by line from the
+        uploaded file. A header row ("id", "email" or "student") is skipped.
+        """
+        lines = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        for number, cells in enumerate(csv.reader(lines)):
+            value = next((cell.strip() for cell in cells if cell.strip()), None)
+            if value is None:
+                continue
+            if number == 0 and value.lower() in ("id", "email", "student"):
+                continue
+            yield value
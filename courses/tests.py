@@ -1,3 +1,176 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from common.Permissions.membership import membership_cache_stats
+from common.tests.factories import make_user
+from .models import Course, CourseTeacher, Enrollment
+from .services import EnrollmentService
 
-# Create your tests here.
+User = get_user_model()
+
+
+class CourseListQueryCountTests(TestCase):
+    """
+    The course list costs the same number of queries however many courses,
+    teachers and enrollments the page holds.
+    """
+
+    # courses, the teachers with their users and the enrollments
+    LIST_QUERIES = 3
+
+    def setUp(self):
+        self.owner = make_user(User.Role.TEACHER)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def add_courses(self, number, teachers=3, students=4):
+        for _ in range(number):
+            course = Course.objects.create(title="Course", created_by=self.owner)
+            CourseTeacher.objects.create(
+                course=course, teacher=self.owner, role=CourseTeacher.Role.OWNER
+            )
+            for _ in range(teachers):
+                CourseTeacher.objects.create(
+                    course=course, teacher=make_user(User.Role.TEACHER)
+                )
+            for _ in range(students):
+                Enrollment.objects.create(
+                    course=course,
+                    student=make_user(User.Role.STUDENT),
+                    status=Enrollment.Status.ACCEPTED,
+                    is_active=True,
+                )
+
+    def list_courses(self):
+        response = self.client.get("/api/courses/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_query_count_does_not_grow_with_courses(self):
+        self.add_courses(2)
+        with self.assertNumQueries(self.LIST_QUERIES):
+            self.assertEqual(len(self.list_courses()), 2)
+
+        self.add_courses(8, teachers=5, students=10)
+        with self.assertNumQueries(self.LIST_QUERIES):
+            courses = self.list_courses()
+        self.assertEqual(len(courses), 10)
+        self.assertEqual(
+            sorted(len(course["teachers"]) for course in courses), [4] * 2 + [6] * 8
+        )
+        self.assertEqual(
+            sorted(len(course["students"]) for course in courses), [4] * 2 + [10] * 8
+        )
+
+
+@override_settings(MEMBERSHIP_CACHE=True)
+class MembershipCacheTests(TestCase):
+    """
+    A student removed from a course loses access on the next request,
+    even though their roles were cached while they were enrolled.
+    """
+
+    def setUp(self):
+        cache.clear()
+        owner = make_user(User.Role.TEACHER)
+        self.student = make_user(User.Role.STUDENT)
+        self.course = Course.objects.create(title="Private", created_by=owner)
+        CourseTeacher.objects.create(
+            course=self.course, teacher=owner, role=CourseTeacher.Role.OWNER
+        )
+        self.enrollment = Enrollment.objects.create(
+            course=self.course,
+            student=self.student,
+            status=Enrollment.Status.ACCEPTED,
+            is_active=True,
+        )
+        self.teacher_client = APIClient()
+        self.teacher_client.force_authenticate(owner)
+        self.student_client = APIClient()
+        self.student_client.force_authenticate(self.student)
+
+    def list_lectures(self):
+        return self.student_client.get(f"/api/courses/{self.course.pk}/lectures/")
+
+    def prime_cache(self):
+        self.assertEqual(self.list_lectures().status_code, 200)
+        hits = membership_cache_stats()["hits"]
+        self.assertEqual(self.list_lectures().status_code, 200)
+        self.assertEqual(membership_cache_stats()["hits"], hits + 1)
+
+    def test_removed_student_is_refused(self):
+        self.prime_cache()
+        # the roles are invalidated once the removal commits
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.teacher_client.delete(
+                f"/api/courses/{self.course.pk}/students/{self.student.pk}/"
+            )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.list_lectures().status_code, 403)
+
+    def test_rejected_student_is_refused(self):
+        self.prime_cache()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.teacher_client.patch(
+                f"/api/courses/{self.course.pk}/enrollments/{self.enrollment.pk}/",
+                {"status": Enrollment.Status.REJECTED},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.list_lectures().status_code, 403)
+
+
+class BulkEnrollTests(TestCase):
+    def setUp(self):
+        self.owner = make_user(User.Role.TEACHER)
+        self.course = Course.objects.create(title="Course", created_by=self.owner)
+        self.student = make_user(User.Role.STUDENT)
+
+    def test_identifiers(self):
+        other = make_user(User.Role.STUDENT)
+        report = EnrollmentService.bulk_enroll(
+            self.course,
+            [str(self.student.pk), other.email, "²", "nobody@example.com"],
+            self.owner,
+        )
+        self.assertEqual(
+            [row["result"] for row in report["results"]],
+            ["enrolled", "enrolled", "not_found", "not_found"],
+        )
+
+
+class SlugSnapshotTests(TestCase):
+    """
+    The slug follows the title through repeated saves and reloads of the
+    same instance.
+    """
+
+    def setUp(self):
+        self.course = Course.objects.create(
+            title="First", created_by=make_user(User.Role.TEACHER)
+        )
+
+    def assertSlug(self, slug):
+        self.assertEqual(self.course.slug, slug)
+        self.assertEqual(Course.objects.get(pk=self.course.pk).slug, slug)
+
+    def test_every_title_change_is_seen(self):
+        for title in ("Second", "Third", "First"):
+            self.course.title = title
+            self.course.save()
+            self.assertSlug(title.lower())
+
+    def test_title_left_out_of_update_fields_is_seen_later(self):
+        self.course.title = "Second"
+        self.course.save(update_fields=["description"])
+        self.assertSlug("first")
+        self.course.save(update_fields=["title"])
+        self.assertSlug("second")
+
+    def test_refresh_from_db_is_seen(self):
+        Course.objects.filter(pk=self.course.pk).update(title="Second", slug="second")
+        self.course.refresh_from_db()
+        self.course.title = "First"
+        self.course.save()
+        self.assertSlug("first")
@@ -3,6 +3,13 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Course, Enrollment, CourseTeacher
+from .services import EnrollmentService
+from submissions.models import GradingScale
+from submissions.services import (
+    AssignmentStatsService,
+    GradebookService,
+    GradeService,
+)
 from .serializers import (
     CourseSerializer,
     CourseTeacherCreateSerializer,
@@ -17,18 +24,33 @@ from common.Permissions.teacherpermissions import (
     IsCourseOwner,
     IsCourseTeacher,
 )
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import IntegrityError
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from django.contrib.auth import get_user_model
 from common.logging.view_part_logging.baseapiview import BaseViewSet
+from common.pagination.paginators import (
+    CoursePagination,
+    CourseTeacherPagination,
+    EnrollmentPagination,
+)
+
 User = get_user_model()
 
 
 class CourseViewSet(BaseViewSet, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
+    pagination_class = CoursePagination
+    # course permissions read the course id from the detail route
+    course_lookup_kwarg = "pk"
 
     def get_permissions(self):
+        # extra actions that declare their own permission_classes keep them
+        handler = getattr(self, self.action or "", None)
+        if "permission_classes" in getattr(handler, "kwargs", {}):
+            return super().get_permissions()
+
         if self.action in ["create"]:
             self.permission_classes = [IsAuthenticated, IsTeacher]
         elif self.action in [
@@ -53,21 +75,23 @@ class CourseViewSet(BaseViewSet, viewsets.ModelViewSet):
         )
 
     def get_queryset(self):
-        user = self.request.user
-        if not user.is_authenticated:
-            return Course.objects.filter(visibility=Course.Visibility.PUBLIC)
+        queryset = Course.objects.visible_to(self.request.user)
 
-        if user.role == User.Role.TEACHER:
-            return Course.objects.filter(
-                teachers__teacher=user
-            ) | Course.objects.filter(visibility=Course.Visibility.PUBLIC)
+        # only the actions that serialize whole courses need the nested rows;
+        # the other actions just resolve the course itself
+        if self.action in ["list", "retrieve"]:
+            queryset = queryset.with_teachers().with_enrollments()
+        return queryset
 
-        if user.role == User.Role.STUDENT:
-            return Course.objects.filter(
-                enrollments__student=user, enrollments__is_active=True
-            ) | Course.objects.filter(visibility=Course.Visibility.PUBLIC)
-
-        return Course.objects.none()
+    def paginated_response(self, queryset, serializer_class, pagination_class):
+        """
+        Paginates the rows of a detail action, which are ordered differently
+        from the courses themselves and need their own cursor.
+        """
+        paginator = pagination_class()
+        page = paginator.paginate_queryset(queryset, self.request, view=self)
+        serializer = serializer_class(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=["Post"], url_path="add-teacher")
     def add_teacher(self, request, pk=None):
@@ -106,6 +130,97 @@ class CourseViewSet(BaseViewSet, viewsets.ModelViewSet):
         except (ValidationError, IntegrityError) as e:
             return Response({"error": str(e)}, status=400)
 
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path="bulk-enroll",
+        permission_classes=[IsAuthenticated, IsCourseTeacher],
+    )
+    def bulk_enroll(self, request, pk=None):
+        """
+        Enrolls many students at once, given as {"students": [ids or emails]}
+        or as a CSV `file` with one id or email per row. Answers with a result
+        for every row.
+        """
+        course = self.get_object()
+        upload = request.FILES.get("file")
+        if upload is not None:
+            identifiers = EnrollmentService.read_identifiers(upload)
+        else:
+            identifiers = request.data.get("students")
+            if not isinstance(identifiers, list):
+                return Response(
+                    {
+                        "error": "Send 'students' as a list of ids or emails, or a CSV 'file'."
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        try:
+            report = EnrollmentService.bulk_enroll(
+                course, identifiers, added_by=request.user
+            )
+        except DjangoValidationError as e:
+            return Response(
+                {"error": e.messages[0]}, status=status.HTTP_400_BAD_REQUEST
+            )
+        except UnicodeDecodeError:
+            return Response(
+                {"error": "The CSV file must be UTF-8 encoded."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(report)
+
+    @action(
+        detail=True,
+        methods=["get"],
+        permission_classes=[IsAuthenticated, IsCourseTeacher],
+    )
+    def gradebook(self, request, pk=None):
+        course = self.get_object()
+        return Response(GradebookService.build(course))
+
+    @action(
+        detail=True,
+        methods=["get"],
+        permission_classes=[IsAuthenticated, IsCourseTeacher],
+    )
+    def stats(self, request, pk=None):
+        """
+        Submission, late and grading counts and average scores per assignment
+        and for the whole course, read from the stored running totals.
+        """
+        course = self.get_object()
+        return Response(AssignmentStatsService.course_stats(course))
+
+    @action(
+        detail=True,
+        methods=["get", "put"],
+        url_path="grading-scale",
+        permission_classes=[IsAuthenticated, IsCourseTeacher],
+    )
+    def grading_scale(self, request, pk=None):
+        """
+        GET returns the course's {letter: lowest score} scale, PUT replaces it
+        with {"thresholds": {...}} and re-letters the existing grades.
+        """
+        course = self.get_object()
+        if request.method == "GET":
+            scale = GradingScale.objects.filter(course=course).first()
+            thresholds = scale.thresholds if scale else GradingScale().thresholds
+            return Response({"thresholds": thresholds})
+
+        thresholds = (
+            request.data.get("thresholds") if isinstance(request.data, dict) else None
+        )
+        try:
+            relettered = GradeService.set_grading_scale(course, thresholds)
+        except DjangoValidationError as e:
+            return Response(
+                {"error": " ".join(e.messages)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({"thresholds": thresholds, "relettered_grades": relettered})
+
     @action(detail=True, methods=["delete"], url_path="teachers/(?P<teacher_id>[^/.]+)")
     def remove_teacher(self, request, pk=None, teacher_id=None):
         course = self.get_object()
@@ -166,16 +281,18 @@ class CourseViewSet(BaseViewSet, viewsets.ModelViewSet):
     @action(detail=True, methods=["get"])
     def teachers(self, request, pk=None):
         course = self.get_object()
-        teachers = course.course_teachers.all()
-        serializer = CourseTeacherSerializer(teachers, many=True)
-        return Response(serializer.data)
+        teachers = course.course_teachers.select_related("teacher")
+        return self.paginated_response(
+            teachers, CourseTeacherSerializer, CourseTeacherPagination
+        )
 
     @action(detail=True, methods=["get"])
     def students(self, request, pk=None):
         course = self.get_object()
-        students = course.enrollments.filter(is_active=True)
-        serializer = EnrollmentSerializer(students, many=True)
-        return Response(serializer.data)
+        students = course.enrollments.filter(is_active=True).select_related("student")
+        return self.paginated_response(
+            students, EnrollmentSerializer, EnrollmentPagination
+        )
 
     @action(
         detail=True,
@@ -185,9 +302,12 @@ class CourseViewSet(BaseViewSet, viewsets.ModelViewSet):
     )
     def pending_enrollments(self, request, pk=None):
         course = self.get_object()
-        enrollments = course.enrollments.filter(status=Enrollment.Status.PENDING)
-        serializer = EnrollmentSerializer(enrollments, many=True)
-        return Response(serializer.data)
+        enrollments = course.enrollments.filter(
+            status=Enrollment.Status.PENDING
+        ).select_related("student")
+        return self.paginated_response(
+            enrollments, EnrollmentSerializer, EnrollmentPagination
+        )
 
     @action(
         detail=True,
@@ -7,6 +7,11 @@ class LecturesConfig(AppConfig):
 
     def ready(self):
         from common.signals.slug_signal import auto_generate_slug
-        from .models import Lecture
+        from common.signals.blob_signal import release_blobs
+        from .models import Lecture, HomeworkAssignment
 
-        auto_generate_slug(Lecture, source_field="title", slug_field="slug")
+        auto_generate_slug(
+            Lecture, source_field="title", slug_field="slug", scope_fields=("course",)
+        )
+        release_blobs(Lecture, "presentation")
+        release_blobs(HomeworkAssignment, "attachment")
@@ -0,0 +1,87 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:01
+
+import common.field_validators.advanced_file
+import common.storage.content_addressed
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lectures", "0003_alter_homeworkassignment_attachment_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="homeworkassignment",
+            name="attachment",
+            field=models.FileField(
+                blank=True,
+                db_index=True,
+                null=True,
+                storage=common.storage.content_addressed.ContentAddressedStorage(),
+                upload_to="assignments/attachments/",
+                validators=[
+                    common.field_validators.advanced_file.AdvancedFileValidator(
+                        allowed_inner_types=[
+                            "application/pdf",
+                            "text/plain",
+                            "application/msword",
+                            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                            "application/vnd.ms-excel",
+                            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        ],
+                        allowed_types=[
+                            "application/zip",
+                            "application/pdf",
+                            "text/plain",
+                            "application/msword",
+                            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                            "application/vnd.ms-excel",
+                            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        ],
+                        max_compression_ratio=100,
+                        max_entries=1000,
+                        max_size=10485760,
+                        max_uncompressed_size=104857600,
+                    )
+                ],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="lecture",
+            name="presentation",
+            field=models.FileField(
+                blank=True,
+                db_index=True,
+                null=True,
+                storage=common.storage.content_addressed.ContentAddressedStorage(),
+                upload_to="lectures/presentations/",
+                validators=[
+                    common.field_validators.advanced_file.AdvancedFileValidator(
+                        allowed_inner_types=[
+                            "application/pdf",
+                            "text/plain",
+                            "application/msword",
+                            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                            "application/vnd.ms-excel",
+                            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        ],
+                        allowed_types=[
+                            "application/zip",
+                            "application/pdf",
+                            "text/plain",
+                            "application/msword",
+                            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                            "application/vnd.ms-excel",
+                            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        ],
+                        max_compression_ratio=100,
+                        max_entries=1000,
+                        max_size=10485760,
+                        max_uncompressed_size=104857600,
+                    )
+                ],
+            ),
+        ),
+    ]
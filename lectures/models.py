@@ -1,5 +1,7 @@
 from django.db import models
+from common.utils.slugify import SlugRetryMixin
 from common.field_validators.advanced_file import AdvancedFileValidator
+from common.storage.content_addressed import blob_storage
 from courses.models import Course
 from django.db.models import UniqueConstraint
 from django.contrib.auth import get_user_model
@@ -28,7 +30,7 @@ advanced_validator = AdvancedFileValidator(
 )
 
 
-class Lecture(models.Model):
+class Lecture(SlugRetryMixin, models.Model):
     course = models.ForeignKey(
         Course, on_delete=models.CASCADE, related_name="lectures"
     )
@@ -44,6 +46,9 @@ class Lecture(models.Model):
         blank=True,
         null=True,
         validators=[advanced_validator],
+        storage=blob_storage,
+        # looked up by name when a row using the blob is deleted
+        db_index=True,
     )
     order = models.PositiveIntegerField(default=1)
     is_published = models.BooleanField(default=False)
@@ -84,6 +89,9 @@ class HomeworkAssignment(models.Model):
         blank=True,
         null=True,
         validators=[advanced_validator],
+        storage=blob_storage,
+        # looked up by name when a row using the blob is deleted
+        db_index=True,
     )
     allow_multiple_submissions = models.BooleanField(default=True)
     created_by = models.ForeignKey(
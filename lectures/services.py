@@ -1,18 +1,75 @@
 from .models import Lecture, HomeworkAssignment
-from django.db import models
+from courses.models import Course
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from django.utils.text import slugify
 
 
 class LectureService:
     @staticmethod
+    @transaction.atomic
     def reorder(lecture, new_order):
-        course = lecture.course
-        lectures = course.lectures.exclude(id=lecture.id).order_by("order")
-
-        new_order = min(new_order, lectures.count())
-        lectures = list(lectures.exclude(id=lecture.id))
-        lectures.insert(new_order - 1, lecture)
-        for idx, l in enumerate(lectures, start=1):
-            if l.order != idx:
-                l.order = idx
-                l.save(update_fields=["order"])
+        """
+        Moves a lecture to the given 1-based position and renumbers the others.
+        """
+        LectureService._lock_course(lecture.course_id)
+        current = LectureService._current_order(lecture.course_id)
+
+        ordered_ids = [lecture_id for lecture_id in current if lecture_id != lecture.id]
+        new_order = min(new_order, len(ordered_ids) + 1)
+        ordered_ids.insert(new_order - 1, lecture.id)
+
+        LectureService._apply_order(current, ordered_ids)
+
+    @staticmethod
+    @transaction.atomic
+    def set_order(course_id, lecture_ids):
+        """
+        Applies a full ordering of the course lectures, given as a list of lecture ids.
+        """
+        LectureService._lock_course(course_id)
+        current = LectureService._current_order(course_id)
+
+        if len(lecture_ids) != len(current) or set(lecture_ids) != set(current):
+            raise ValidationError(
+                "The order must list every lecture of the course exactly once."
+            )
+
+        LectureService._apply_order(current, lecture_ids)
+
+    @staticmethod
+    def _lock_course(course_id):
+        # concurrent reorders of the same course wait for each other
+        # instead of interleaving their updates
+        Course.objects.select_for_update().filter(pk=course_id).values("pk").first()
+
+    @staticmethod
+    def _current_order(course_id):
+        return dict(
+            Lecture.objects.filter(course_id=course_id)
+            .order_by("order", "id")
+            .values_list("id", "order")
+        )
+
+    @staticmethod
+    def _apply_order(current, ordered_ids):
+        """
+        Renumbers the lectures whose position changed with a single UPDATE ... CASE.
+        """
+        changes = {
+            lecture_id: position
+            for position, lecture_id in enumerate(ordered_ids, start=1)
+            if current[lecture_id] != position
+        }
+        if not changes:
+            return
+
+        Lecture.objects.filter(id__in=changes).update(
+            order=models.Case(
+                *[
+                    models.When(id=lecture_id, then=models.Value(position))
+                    for lecture_id, position in changes.items()
+                ],
+                output_field=models.PositiveIntegerField(),
+            )
+        )
@@ -1,3 +1,56 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from rest_framework.test import APIClient
+from courses.models import Course, CourseTeacher
+from .models import Lecture
 
-# Create your tests here.
+User = get_user_model()
+
+
+class BulkReorderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            "owner@example.com", role=User.Role.TEACHER
+        )
+        cls.course = Course.objects.create(title="Course", created_by=cls.owner)
+        CourseTeacher.objects.create(
+            course=cls.course, teacher=cls.owner, role=CourseTeacher.Role.OWNER
+        )
+        cls.lectures = [
+            Lecture.objects.create(course=cls.course, title=f"Lecture {number}")
+            for number in range(1, 4)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def reorder(self, body):
+        return self.client.post(
+            f"/api/courses/{self.course.pk}/lectures/bulk-reorder/", body, format="json"
+        )
+
+    def test_reorders_lectures(self):
+        first, second, third = (lecture.pk for lecture in self.lectures)
+        response = self.reorder({"order": [third, first, second]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(
+                Lecture.objects.filter(course=self.course).values_list("pk", flat=True)
+            ),
+            [third, first, second],
+        )
+
+    def test_malformed_orders_are_refused(self):
+        ids = [lecture.pk for lecture in self.lectures]
+        for body in (
+            ids,
+            {"order": "".join(map(str, ids))},
+            {"order": [str(pk) for pk in ids]},
+            {"order": [True] + ids[1:]},
+            {"order": None},
+            {},
+        ):
+            with self.subTest(body=body):
+                self.assertEqual(self.reorder(body).status_code, 400)
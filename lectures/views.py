@@ -10,11 +10,17 @@ from common.Permissions.student_and_teacher_permissions import (
     IsEnrolledStudentOrCourseTeacher,
 )
 from .services import LectureService
+from django.core.exceptions import ValidationError as DjangoValidationError
 from common.Permissions.teacherpermissions import IsCourseTeacher
+from common.pagination.paginators import (
+    LecturePagination,
+    HomeworkAssignmentPagination,
+)
 
 
 class LectureViewSet(viewsets.ModelViewSet):
     serializer_class = LectureSerializer
+    pagination_class = LecturePagination
 
     def get_queryset(self):
         course_pk = self.kwargs.get("course_pk")
@@ -85,9 +91,36 @@ class LectureViewSet(viewsets.ModelViewSet):
         LectureService.reorder(lecture, new_order)
         return Response({"detail": "Lecture reordered successfully."})
 
+    @action(detail=False, methods=["post"], url_path="bulk-reorder")
+    def bulk_reorder(self, request, *args, **kwargs):
+        """
+        Applies a full ordering of the course lectures in one call,
+        e.g. {"order": [3, 1, 2]}.
+        """
+        lecture_ids = (
+            request.data.get("order") if isinstance(request.data, dict) else None
+        )
+        if not isinstance(lecture_ids, list) or not all(
+            isinstance(lecture_id, int) and not isinstance(lecture_id, bool)
+            for lecture_id in lecture_ids
+        ):
+            return Response(
+                {"detail": "order must be a list of lecture ids."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            LectureService.set_order(self.kwargs.get("course_pk"), lecture_ids)
+        except DjangoValidationError as e:
+            return Response(
+                {"detail": e.messages[0]}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({"detail": "Lectures reordered successfully."})
+
 
 class HomeworkAssignmentViewSet(viewsets.ModelViewSet):
     serializer_class = HomeworkAssignmentSerializer
+    pagination_class = HomeworkAssignmentPagination
 
     def get_permissions(self):
         if self.action in ["list", "retrieve"]:
@@ -101,4 +134,7 @@ class HomeworkAssignmentViewSet(viewsets.ModelViewSet):
         if not lecture_pk:
             return HomeworkAssignment.objects.none()
 
-        return HomeworkAssignment.objects.filter(lecture_id=lecture_pk)
+        # object permissions resolve the course through the lecture
+        return HomeworkAssignment.objects.filter(lecture_id=lecture_pk).select_related(
+            "lecture"
+        )
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class SubmissionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'submissions'
+
+    def ready(self):
+        from common.signals.blob_signal import release_blobs
+        from .models import SubmissionAttachment
+
+        release_blobs(SubmissionAttachment, "file")
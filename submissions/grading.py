@@ -0,0 +1,66 @@
+from bisect import bisect_right
+from django.core.exceptions import ValidationError
+from django.db.models import Case, Q, Value, When
+
+NOT_APPLICABLE = "NA"
+
+
+def default_thresholds():
+    """
+    Lowest score of each letter, used by courses without their own scale.
+    """
+    return {"A": 90, "B": 80, "C": 70, "D": 60, "F": 0}
+
+
+class CompiledScale:
+    """
+    A grading scale compiled for lookups: the thresholds sorted ascending,
+    so the letter of a score is found with one bisect.
+    """
+
+    def __init__(self, thresholds):
+        ordered = sorted(thresholds.items(), key=lambda item: item[1])
+        self.minimums = [minimum for _, minimum in ordered]
+        self.letters = [letter for letter, _ in ordered]
+
+    def letter(self, score):
+        if score is None:
+            return NOT_APPLICABLE
+        # thresholds start at 0, so every valid score lands on a letter
+        return self.letters[max(bisect_right(self.minimums, score) - 1, 0)]
+
+    def case(self, field="score"):
+        """
+        SQL CASE computing the same letter as `letter` from `field`, for
+        set-based updates.
+        """
+        whens = [When(Q(**{f"{field}__isnull": True}), then=Value(NOT_APPLICABLE))]
+        whens += [
+            When(Q(**{f"{field}__gte": minimum}), then=Value(letter))
+            for minimum, letter in zip(reversed(self.minimums), reversed(self.letters))
+        ]
+        return Case(*whens, default=Value(self.letters[0]))
+
+
+def validate_thresholds(thresholds, letters):
+    """
+    Checks a {letter: lowest score} mapping: known letters, distinct scores
+    between 0 and 100 and a letter starting at 0.
+    """
+    if not isinstance(thresholds, dict) or not thresholds:
+        raise ValidationError("The scale must map letters to their lowest score.")
+    unknown = set(thresholds) - set(letters)
+    if unknown:
+        raise ValidationError(f"Unknown grade letters: {', '.join(sorted(unknown))}.")
+    minimums = list(thresholds.values())
+    if any(
+        not isinstance(minimum, int)
+        or isinstance(minimum, bool)
+        or not 0 <= minimum <= 100
+        for minimum in minimums
+    ):
+        raise ValidationError("Scores must be whole numbers between 0 and 100.")
+    if len(set(minimums)) != len(minimums):
+        raise ValidationError("Two letters cannot start at the same score.")
+    if 0 not in minimums:
+        raise ValidationError("One letter must start at 0.")
@@ -0,0 +1,197 @@
+import os
+import threading
+import uuid
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from common.logging import logger
+from .models import (
+    Submission,
+    SubmissionAttachment,
+    SubmissionIngestion,
+    advanced_validator,
+)
+from .services import AssignmentStatsService, SubmissionService
+
+STAGING_DIR = "submission_staging"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Process wide worker pool, created on first use.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.SUBMISSION_INGESTION_WORKERS,
+                    thread_name_prefix="submission-ingestion",
+                )
+    return _executor
+
+
+class SubmissionIngestionService:
+    @staticmethod
+    def accept(assignment, student, text=None, files=()):
+        """
+        Stamps the receive time, stages the uploads and queues the submission.
+        Only the size is checked here, so oversized uploads never reach the
+        staging area; the other validation and the insert happen later on a
+        worker thread.
+        """
+        for upload in files:
+            advanced_validator.validate_size(upload)
+
+        ingestion = SubmissionIngestion(
+            assignment=assignment,
+            student=student,
+            text=text,
+            received_at=timezone.now(),
+        )
+        try:
+            for upload in files:
+                ingestion.staged_files.append(
+                    default_storage.save(
+                        f"{STAGING_DIR}/{ingestion.id}/{upload.name}", upload
+                    )
+                )
+            ingestion.save(force_insert=True)
+        except BaseException:
+            # nothing refers to the staged files without the row
+            for name in ingestion.staged_files:
+                default_storage.delete(name)
+            raise
+
+        transaction.on_commit(
+            lambda: get_executor().submit(
+                SubmissionIngestionService.process, ingestion.pk
+            )
+        )
+        return ingestion
+
+    @staticmethod
+    def process(ingestion_id):
+        """
+        Validates and persists one queued submission. Safe to call more than once,
+        only the caller that moves it out of QUEUED does the work.
+        """
+        close_old_connections()
+        try:
+            claimed = SubmissionIngestion.objects.filter(
+                pk=ingestion_id, status=SubmissionIngestion.Status.QUEUED
+            ).update(status=SubmissionIngestion.Status.PROCESSING)
+            if not claimed:
+                return
+
+            ingestion = SubmissionIngestion.objects.select_related(
+                "assignment", "student"
+            ).get(pk=ingestion_id)
+            try:
+                submission = SubmissionIngestionService._persist(ingestion)
+            except ValidationError as e:
+                ingestion.status = SubmissionIngestion.Status.FAILED
+                ingestion.error = " ".join(e.messages)
+            except Exception as e:
+                logger.exception(f"Submission ingestion {ingestion_id} failed: {e}")
+                ingestion.status = SubmissionIngestion.Status.FAILED
+                ingestion.error = "The submission could not be processed."
+            else:
+                ingestion.status = SubmissionIngestion.Status.COMPLETED
+                ingestion.submission = submission
+            ingestion.save(
+                update_fields=["status", "error", "submission", "updated_at"]
+            )
+
+            for name in ingestion.staged_files:
+                default_storage.delete(name)
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def resume_pending():
+        """
+        Queues again the ingestions left behind by a stopped process.
+        """
+        SubmissionIngestion.objects.filter(
+            status=SubmissionIngestion.Status.PROCESSING
+        ).update(status=SubmissionIngestion.Status.QUEUED)
+        pending = list(
+            SubmissionIngestion.objects.filter(
+                status=SubmissionIngestion.Status.QUEUED
+            ).values_list("pk", flat=True)
+        )
+        for ingestion_id in pending:
+            get_executor().submit(SubmissionIngestionService.process, ingestion_id)
+        return len(pending)
+
+    @staticmethod
+    def discard_orphaned_staging(older_than):
+        """
+        Deletes staged uploads older than `older_than` that no ingestion row
+        refers to. accept() stages them before its row is committed, so they
+        are left behind when the caller's transaction rolls back.
+        Returns the number of files deleted.
+        """
+        if not default_storage.exists(STAGING_DIR):
+            return 0
+        directories = set()
+        for directory in default_storage.listdir(STAGING_DIR)[0]:
+            try:
+                directories.add(str(uuid.UUID(directory)))
+            except ValueError:
+                continue
+        known = {
+            str(pk)
+            for pk in SubmissionIngestion.objects.filter(
+                pk__in=directories
+            ).values_list("pk", flat=True)
+        }
+
+        count = 0
+        for directory in directories - known:
+            for name in default_storage.listdir(f"{STAGING_DIR}/{directory}")[1]:
+                path = f"{STAGING_DIR}/{directory}/{name}"
+                if default_storage.get_modified_time(path) < older_than:
+                    default_storage.delete(path)
+                    count += 1
+        return count
+
+    @staticmethod
+    @transaction.atomic
+    def _persist(ingestion):
+        file_field = SubmissionAttachment._meta.get_field("file")
+        with ExitStack() as stack:
+            uploads = []
+            for name in ingestion.staged_files:
+                upload = File(default_storage.open(name), name=os.path.basename(name))
+                stack.enter_context(upload)
+                file_field.run_validators(upload)
+                uploads.append(upload)
+
+            submission = SubmissionService.create_submission(
+                assignment=ingestion.assignment,
+                student=ingestion.student,
+                text=ingestion.text,
+                submit_time=ingestion.received_at,
+                record_stats=False,
+            )
+            # submitted_at is auto_now_add, keep the time the upload was accepted instead
+            Submission.objects.filter(pk=submission.pk).update(
+                submitted_at=ingestion.received_at
+            )
+            submission.submitted_at = ingestion.received_at
+
+            for upload in uploads:
+                SubmissionAttachment.objects.create(submission=submission, file=upload)
+        # last, so the stats row is not locked while the files are stored
+        AssignmentStatsService.record_submission(submission)
+        return submission
@@ -0,0 +1,24 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from submissions.ingestion import SubmissionIngestionService
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes staged submission files that no queued submission refers to, "
+        "left behind when the request that staged them rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=int,
+            default=6,
+            help="Only files staged longer ago than this are deleted.",
+        )
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(hours=options["hours"])
+        count = SubmissionIngestionService.discard_orphaned_staging(older_than)
+        self.stdout.write(f"Deleted {count} orphaned staged file(s).")
@@ -0,0 +1,24 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from submissions.uploads import UploadSessionService
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes resumable uploads that were never finalized, together with "
+        "their partially uploaded files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=int,
+            default=24,
+            help="Only sessions idle for longer than this are deleted.",
+        )
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(hours=options["hours"])
+        count = UploadSessionService.discard_stale(older_than)
+        self.stdout.write(f"Deleted {count} stale upload session(s).")
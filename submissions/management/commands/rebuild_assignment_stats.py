@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from submissions.services import AssignmentStatsService
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the stats of every assignment from its submissions and "
+        "grades. Use it after changing submissions or grades outside the services."
+    )
+
+    def handle(self, *args, **options):
+        count = AssignmentStatsService.rebuild()
+        self.stdout.write(f"Rebuilt the stats of {count} assignment(s).")
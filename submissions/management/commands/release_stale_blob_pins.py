@@ -0,0 +1,23 @@
+import time
+from django.core.management.base import BaseCommand
+from common.storage.content_addressed import blob_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Removes the blob pins left by saves outside a transaction or rolled "
+        "back, and deletes the blobs no row uses anymore."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=int,
+            default=1,
+            help="Only pins older than this are removed.",
+        )
+
+    def handle(self, *args, **options):
+        older_than = time.time() - options["hours"] * 3600
+        count = blob_storage.release_stale_pins(older_than)
+        self.stdout.write(f"Removed {count} stale blob pin(s).")
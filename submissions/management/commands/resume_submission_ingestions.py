@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from submissions.ingestion import SubmissionIngestionService
+
+
+class Command(BaseCommand):
+    help = (
+        "Processes submissions that were queued through the async submit endpoint "
+        "but not finished, e.g. after a restart. Run it while no web worker is "
+        "processing ingestions."
+    )
+
+    def handle(self, *args, **options):
+        count = SubmissionIngestionService.resume_pending()
+        self.stdout.write(f"Resumed {count} queued submission(s).")
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:32
+
+import common.field_validators.advanced_file
+import common.storage.content_addressed
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("submissions", "0003_submissioningestion"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="submissionattachment",
+            name="file",
+            field=models.FileField(
+                storage=common.storage.content_addressed.ContentAddressedStorage(),
+                upload_to="submission_attachments/",
+                validators=[
+                    common.field_validators.advanced_file.AdvancedFileValidator(
+                        allowed_inner_types=[
+                            "application/pdf",
+                            "text/plain",
+                            "application/msword",
+                            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                            "application/vnd.ms-excel",
+                            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        ],
+                        allowed_types=[
+                            "application/zip",
+                            "application/pdf",
+                            "text/plain",
+                            "application/msword",
+                            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                            "application/vnd.ms-excel",
+                            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        ],
+                        max_compression_ratio=100,
+                        max_entries=1000,
+                        max_size=10485760,
+                        max_uncompressed_size=104857600,
+                    )
+                ],
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:41
+
+import django.db.models.deletion
+import submissions.grading
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0001_initial"),
+        ("submissions", "0005_uploadsession"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GradingScale",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "thresholds",
+                    models.JSONField(default=submissions.grading.default_thresholds),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "course",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="grading_scale",
+                        to="courses.course",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "grading scale",
+                "verbose_name_plural": "grading scales",
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_stats(apps, schema_editor):
+    HomeworkAssignment = apps.get_model("lectures", "HomeworkAssignment")
+    AssignmentStats = apps.get_model("submissions", "AssignmentStats")
+    totals = HomeworkAssignment.objects.annotate(
+        submission_count=Count("submissions"),
+        student_count=Count("submissions__student", distinct=True),
+        late_count=Count("submissions", filter=Q(submissions__status="LATE")),
+        graded_count=Count("submissions__grade"),
+        scored_count=Count("submissions__grade__score"),
+        score_total=Coalesce(Sum("submissions__grade__score"), 0),
+    ).values(
+        "id",
+        "submission_count",
+        "student_count",
+        "late_count",
+        "graded_count",
+        "scored_count",
+        "score_total",
+    )
+    AssignmentStats.objects.bulk_create(
+        (
+            AssignmentStats(assignment_id=row.pop("id"), **row)
+            for row in totals.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lectures", "0003_alter_homeworkassignment_attachment_and_more"),
+        ("submissions", "0006_gradingscale"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AssignmentStats",
+            fields=[
+                (
+                    "assignment",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="lectures.homeworkassignment",
+                    ),
+                ),
+                ("submission_count", models.PositiveIntegerField(default=0)),
+                ("student_count", models.PositiveIntegerField(default=0)),
+                ("late_count", models.PositiveIntegerField(default=0)),
+                ("graded_count", models.PositiveIntegerField(default=0)),
+                ("scored_count", models.PositiveIntegerField(default=0)),
+                ("score_total", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "assignment stats",
+                "verbose_name_plural": "assignment stats",
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
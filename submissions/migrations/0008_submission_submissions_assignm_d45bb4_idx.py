@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lectures", "0003_alter_homeworkassignment_attachment_and_more"),
+        ("submissions", "0007_assignmentstats"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["assignment", "-submitted_at"],
+                name="submissions_assignm_d45bb4_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("submissions", "0009_alter_submissionattachment_file"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadsession",
+            name="writer",
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,12 +1,78 @@
+import uuid
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from common.field_validators.advanced_file import AdvancedFileValidator
+from common.storage.content_addressed import blob_storage
+from courses.models import Course, CourseTeacher
 from lectures.models import HomeworkAssignment
+from .grading import CompiledScale, default_thresholds, validate_thresholds
 from django.core.validators import MaxValueValidator, MinValueValidator
 
 User = get_user_model()
 
+
+def taught_by(user, course_path):
+    """
+    EXISTS filter keeping the rows whose course, reached through `course_path`,
+    is taught by `user`. Served by the (course, teacher) unique index and,
+    unlike a join through the course teachers, needs no DISTINCT.
+    """
+    return models.Exists(
+        CourseTeacher.objects.filter(
+            course_id=models.OuterRef(f"{course_path}_id"), teacher=user
+        )
+    )
+
+
+class SubmissionQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Submissions the user may see: their own for students, those of the
+        courses they teach for teachers.
+        """
+        if not user.is_authenticated:
+            return self.none()
+        if user.role == User.Role.STUDENT:
+            return self.filter(student=user)
+        if user.role == User.Role.TEACHER:
+            return self.filter(taught_by(user, "assignment__lecture__course"))
+        return self.none()
+
+
+class GradeQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Grades of the user's own submissions for students, of the courses
+        they teach for teachers.
+        """
+        if not user.is_authenticated:
+            return self.none()
+        if user.role == User.Role.STUDENT:
+            return self.filter(submission__student=user)
+        if user.role == User.Role.TEACHER:
+            return self.filter(
+                taught_by(user, "submission__assignment__lecture__course")
+            )
+        return self.none()
+
+
+class GradeCommentQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Comments on the grades the user may see, see GradeQuerySet.visible_to.
+        """
+        if not user.is_authenticated:
+            return self.none()
+        if user.role == User.Role.STUDENT:
+            return self.filter(grade__submission__student=user)
+        if user.role == User.Role.TEACHER:
+            return self.filter(
+                taught_by(user, "grade__submission__assignment__lecture__course")
+            )
+        return self.none()
+
+
 advanced_validator = AdvancedFileValidator(
     max_size=10 * 1024 * 1024,
     allowed_types=[
@@ -52,6 +118,8 @@ class Submission(models.Model):
     submitted_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SubmissionQuerySet.as_manager()
+
     class Meta:
         verbose_name = "submission"
         verbose_name_plural = "submissions"
@@ -64,6 +132,8 @@ class Submission(models.Model):
         indexes = [
             models.Index(fields=["assignment", "student"]),
             models.Index(fields=["student", "submitted_at"]),
+            # an assignment's submissions page in the default order, without a sort
+            models.Index(fields=["assignment", "-submitted_at"]),
         ]
 
     def __str__(self):
@@ -91,7 +161,11 @@ class SubmissionAttachment(models.Model):
     )
 
     file = models.FileField(
-        upload_to="submission_attachments/", validators=[advanced_validator]
+        upload_to="submission_attachments/",
+        validators=[advanced_validator],
+        storage=blob_storage,
+        # looked up by name when a row using the blob is deleted
+        db_index=True,
     )
     uploaded_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
@@ -100,6 +174,55 @@ class SubmissionAttachment(models.Model):
         return f"Attachment for Submission {self.submission.id}"
 
 
+class SubmissionIngestion(models.Model):
+    """
+    A submission accepted during a deadline burst and finished in the background.
+    The upload is staged and `received_at` is the time the server accepted it,
+    which is what decides whether the submission is late.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "QUEUED", "Queued"
+        PROCESSING = "PROCESSING", "Processing"
+        COMPLETED = "COMPLETED", "Completed"
+        FAILED = "FAILED", "Failed"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    assignment = models.ForeignKey(
+        HomeworkAssignment, on_delete=models.CASCADE, related_name="ingestions"
+    )
+    student = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="submission_ingestions"
+    )
+    text = models.TextField(blank=True, null=True)
+    # storage names of the staged uploads
+    staged_files = models.JSONField(default=list, blank=True)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.QUEUED
+    )
+    error = models.TextField(blank=True)
+    submission = models.ForeignKey(
+        Submission,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="ingestions",
+    )
+    received_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "submission ingestion"
+        verbose_name_plural = "submission ingestions"
+        ordering = ["received_at"]
+        indexes = [
+            models.Index(fields=["status", "received_at"]),
+        ]
+
+    def __str__(self):
+        return f"Ingestion {self.id} ({self.status})"
+
+
 class Grade(models.Model):
 
     class GradeLetter(models.TextChoices):
@@ -125,6 +248,8 @@ class Grade(models.Model):
     graded_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = GradeQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Grade"
         verbose_name_plural = "Grades"
@@ -133,6 +258,100 @@ class Grade(models.Model):
         return f"Grade for Submission {self.submission.id}"
 
 
+class GradingScale(models.Model):
+    """
+    A course's grading scale, the lowest score of each letter
+    ({"A": 90, ..., "F": 0}). Courses without one use default_thresholds.
+    """
+
+    course = models.OneToOneField(
+        Course, on_delete=models.CASCADE, related_name="grading_scale"
+    )
+    thresholds = models.JSONField(default=default_thresholds)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "grading scale"
+        verbose_name_plural = "grading scales"
+
+    def __str__(self):
+        return f"Grading scale of {self.course.title}"
+
+    def clean(self):
+        letters = [
+            letter
+            for letter in Grade.GradeLetter.values
+            if letter != Grade.GradeLetter.NA
+        ]
+        validate_thresholds(self.thresholds, letters)
+
+    def compile(self):
+        return CompiledScale(self.thresholds)
+
+    @classmethod
+    def for_courses(cls, course_ids):
+        """
+        The compiled scale of every given course, default ones included, in one query.
+        """
+        scales = dict(
+            cls.objects.filter(course_id__in=course_ids).values_list(
+                "course_id", "thresholds"
+            )
+        )
+        return {
+            course_id: CompiledScale(scales.get(course_id) or default_thresholds())
+            for course_id in course_ids
+        }
+
+    @classmethod
+    def for_submission(cls, submission):
+        scale = cls.objects.filter(
+            course__lectures__homework_assignments__submissions=submission
+        ).first()
+        return scale.compile() if scale else CompiledScale(default_thresholds())
+
+
+class AssignmentStats(models.Model):
+    """
+    Running totals of an assignment's submissions and grades, so dashboards
+    read one row instead of counting them. SubmissionService and GradeService
+    keep them current with F() increments in the same transaction as their
+    writes; `manage.py rebuild_assignment_stats` recomputes them from scratch.
+    """
+
+    assignment = models.OneToOneField(
+        HomeworkAssignment,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+    )
+    submission_count = models.PositiveIntegerField(default=0)
+    # students with at least one submission
+    student_count = models.PositiveIntegerField(default=0)
+    late_count = models.PositiveIntegerField(default=0)
+    graded_count = models.PositiveIntegerField(default=0)
+    # grades with a score, the ones the average is taken over
+    scored_count = models.PositiveIntegerField(default=0)
+    score_total = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    COUNTERS = (
+        "submission_count",
+        "student_count",
+        "late_count",
+        "graded_count",
+        "scored_count",
+        "score_total",
+    )
+
+    class Meta:
+        verbose_name = "assignment stats"
+        verbose_name_plural = "assignment stats"
+
+    def __str__(self):
+        return f"Stats of assignment {self.assignment_id}"
+
+
 class GradeComment(models.Model):
 
     grade = models.ForeignKey(Grade, on_delete=models.CASCADE, related_name="comments")
@@ -141,5 +360,49 @@ class GradeComment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = GradeCommentQuerySet.as_manager()
+
     def __str__(self):
         return f"Comment by {self.author.first_name} {self.author.last_name}  on Grade {self.grade.id}"
+
+
+class UploadSession(models.Model):
+    """
+    A resumable upload of one submission attachment. The client sends the file
+    in byte ranges, `received` is how much of it is stored so far, and the
+    attachment is created on finalize once every byte has arrived.
+    """
+
+    class Status(models.TextChoices):
+        OPEN = "OPEN", "Open"
+        COMPLETED = "COMPLETED", "Completed"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    submission = models.ForeignKey(
+        Submission, on_delete=models.CASCADE, related_name="upload_sessions"
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    # set while a request writes the range starting at `received`
+    writer = models.UUIDField(null=True, blank=True, editable=False)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.OPEN
+    )
+    attachment = models.ForeignKey(
+        SubmissionAttachment,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="upload_sessions",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "upload session"
+        verbose_name_plural = "upload sessions"
+        ordering = ["created_at"]
+
+    def __str__(self):
+        return f"Upload of {self.filename} for Submission {self.submission_id}"
@@ -1,5 +1,12 @@
 from rest_framework import serializers
-from .models import Submission, SubmissionAttachment, Grade, GradeComment
+from .models import (
+    Submission,
+    SubmissionAttachment,
+    SubmissionIngestion,
+    UploadSession,
+    Grade,
+    GradeComment,
+)
 from users.serializers import UserSerializer
 
 
@@ -30,6 +37,35 @@ class SubmissionSerializer(serializers.ModelSerializer):
         read_only_fields = ["status", "submitted_at", "updated_at"]
 
 
+class SubmissionIngestionSerializer(serializers.ModelSerializer):
+    files = serializers.ListField(
+        child=serializers.FileField(), write_only=True, required=False
+    )
+
+    class Meta:
+        model = SubmissionIngestion
+        fields = ["id", "text", "files", "status", "error", "submission", "received_at"]
+        read_only_fields = ["status", "error", "submission", "received_at"]
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    size = serializers.IntegerField(min_value=1)
+    attachment = SubmissionAttachmentSerializer(read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            "id",
+            "filename",
+            "size",
+            "received",
+            "status",
+            "attachment",
+            "created_at",
+        ]
+        read_only_fields = ["received", "status", "attachment", "created_at"]
+
+
 class GradeCommentSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
 
@@ -57,21 +93,14 @@ class GradeSerializer(serializers.ModelSerializer):
             "updated_at",
             "comments",
         ]
-        read_only_fields = ["graded_by", "graded_at", "updated_at"]
-
-    def validate(self, data):
-        if "score" in data and data["score"] is not None:
-            score = data["score"]
-            if score >= 90:
-                data["grade_letter"] = Grade.GradeLetter.A
-            elif score >= 80:
-                data["grade_letter"] = Grade.GradeLetter.B
-            elif score >= 70:
-                data["grade_letter"] = Grade.GradeLetter.C
-            elif score >= 60:
-                data["grade_letter"] = Grade.GradeLetter.D
-            else:
-                data["grade_letter"] = Grade.GradeLetter.F
-        elif "score" in data and data["score"] is None:
-            data["grade_letter"] = Grade.GradeLetter.NA
-        return data
+        # the letter follows from the score and the course's grading scale,
+        # GradeService computes it
+        read_only_fields = ["grade_letter", "graded_by", "graded_at", "updated_at"]
+
+
+class BulkGradeItemSerializer(serializers.Serializer):
+    submission = serializers.IntegerField(min_value=1)
+    score = serializers.IntegerField(min_value=0, max_value=100, allow_null=True)
+    feedback = serializers.CharField(
+        required=False, allow_blank=True, allow_null=True, default=""
+    )
@@ -1,77 +1,585 @@
-from .models import Submission, Grade
+from collections import Counter, defaultdict
+from .models import AssignmentStats, Submission, Grade, GradingScale
+from .grading import CompiledScale, default_thresholds
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
 from django.utils import timezone
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Q, Sum, Window
+from django.db.models.functions import Coalesce, RowNumber
+from courses.models import CourseTeacher, Enrollment
 from lectures.models import HomeworkAssignment
 
 
+# how many times a submission is retried when a concurrent one took its number
+SUBMISSION_NUMBER_ATTEMPTS = 5
+BULK_GRADE_MAX_ITEMS = 1000
+
+
 class SubmissionService:
     @staticmethod
-    def create_submission(assignment, student, text=None):
-        last_one = (
-            Submission.objects.filter(assignment=assignment, student=student)
-            .order_by("-submission_number")
-            .first()
+    def create_submission(
+        assignment, student, text=None, submit_time=None, record_stats=True
+    ):
+        """
+        Creates the student's next submission for the assignment.
+        `submit_time` is when the server received it (defaults to now)
+        and decides whether the submission is late.
+
+        The stats increment locks the assignment's single stats row until the
+        transaction ends, so it is the last statement. Callers that do more work
+        in the same transaction pass `record_stats=False` and call
+        AssignmentStatsService.record_submission once that work is done.
+
+        The number is taken as MAX(submission_number) + 1 and the insert is
+        guarded by the (assignment, student, submission_number) unique constraint.
+        When two uploads race for the same number, the loser retries with the next one.
+        Any other integrity error is raised right away.
+        """
+        for attempt in range(1, SUBMISSION_NUMBER_ATTEMPTS + 1):
+            submission = None
+            try:
+                with transaction.atomic():
+                    submission = SubmissionService._next_submission(
+                        assignment, student, text, submit_time or timezone.now()
+                    )
+                    submission.save(force_insert=True)
+                    if record_stats:
+                        AssignmentStatsService.record_submission(submission)
+                    return submission
+            except IntegrityError:
+                if attempt == SUBMISSION_NUMBER_ATTEMPTS:
+                    raise
+                if not SubmissionService._number_taken(submission):
+                    raise
+
+    @staticmethod
+    def _last_number(assignment, student):
+        return Submission.objects.filter(
+            assignment=assignment, student=student
+        ).aggregate(last=Max("submission_number"))["last"]
+
+    @staticmethod
+    def _number_taken(submission):
+        # the constraint name differs between databases, so the conflict is
+        # recognised by the number being in use once the insert rolled back
+        return (
+            submission is not None
+            and Submission.objects.filter(
+                assignment_id=submission.assignment_id,
+                student_id=submission.student_id,
+                submission_number=submission.submission_number,
+            ).exists()
         )
-        submission_number = (last_one.submission_number + 1) if last_one else 1
 
-        submit_time = timezone.now()
+    @staticmethod
+    def _next_submission(assignment, student, text, submit_time):
+        last_number = SubmissionService._last_number(assignment, student)
+
+        if last_number and not assignment.allow_multiple_submissions:
+            raise ValidationError(
+                "You cannot submit more than once for this assignment."
+            )
+
         if assignment.due_date and submit_time > assignment.due_date:
             status = Submission.SubmissionStatus.LATE
         else:
             status = (
                 Submission.SubmissionStatus.RESUBMITTED
-                if last_one
+                if last_number
                 else Submission.SubmissionStatus.SUBMITTED
             )
 
         submission = Submission(
             assignment=assignment,
             student=student,
-            submission_number=submission_number,
+            submission_number=(last_number or 0) + 1,
             text=text,
             status=status,
         )
-        submission.full_clean()
-        submission.save()
+        # full_clean() would repeat the checks above with more queries (Submission.clean,
+        # the unique_together check and an existence check per foreign key);
+        # assignment and student are loaded instances and the insert enforces uniqueness
+        submission.clean_fields(exclude=["assignment", "student"])
         return submission
 
+    @staticmethod
+    @transaction.atomic
+    def delete_submission(submission):
+        """
+        Deletes the submission with its grade and takes both out of the
+        assignment's stats.
+        """
+        GradeService.lock_submissions([submission.pk])
+        grade = Grade.objects.filter(submission=submission).first()
+        submission.delete()
+        # the stats row is locked last, see create_submission
+        if grade is not None:
+            AssignmentStatsService.record_grade_deleted(grade, submission.assignment_id)
+        AssignmentStatsService.record_submission_deleted(submission)
+
 
 class GradeService:
     @staticmethod
-    def grade_letter(score):
-        if score is None:
-            return "NA"
-        elif score >= 90:
-            return "A"
-        elif score >= 80:
-            return "B"
-        elif score >= 70:
-            return "C"
-        elif score >= 60:
-            return "D"
-        else:
-            return "F"
+    def grade_letter(score, scale=None):
+        """
+        The letter of `score` on the given compiled scale (the default scale
+        when none is given).
+        """
+        return (scale or CompiledScale(default_thresholds())).letter(score)
 
     @staticmethod
+    @transaction.atomic
     def create_or_update_grade(submission, score, feedback, graded_by):
+        GradeService.lock_submissions([submission.pk])
+        scale = GradingScale.for_submission(submission)
         try:
             grade = Grade.objects.get(submission=submission)
+            previous_score = grade.score
             grade.score = score
-            grade.grade_letter = GradeService.grade_letter(score)
+            grade.grade_letter = GradeService.grade_letter(score, scale)
             grade.feedback = feedback
             grade.graded_by = graded_by
             grade.graded_at = timezone.now()
             grade.full_clean()
             grade.save()
+            AssignmentStatsService.record_grade(
+                submission.assignment_id, False, previous_score, score
+            )
         except ObjectDoesNotExist:
             grade = Grade(
                 submission=submission,
                 score=score,
-                grade_letter=GradeService.grade_letter(score),
+                grade_letter=GradeService.grade_letter(score, scale),
                 feedback=feedback,
                 graded_by=graded_by,
                 graded_at=timezone.now(),
             )
             grade.full_clean()
             grade.save()
+            AssignmentStatsService.record_grade(
+                submission.assignment_id, True, None, score
+            )
         return grade
+
+    @staticmethod
+    @transaction.atomic
+    def delete_grade(grade):
+        assignment_id = grade.submission.assignment_id
+        GradeService.lock_submissions([grade.submission_id])
+        grade.delete()
+        AssignmentStatsService.record_grade_deleted(grade, assignment_id)
+
+    @staticmethod
+    def lock_submissions(submission_ids):
+        """
+        Locks the submissions' rows, in id order, until the transaction ends.
+        Every grade write takes these locks first, so the grade it reads
+        before writing (for the stats deltas) cannot change under it.
+        """
+        list(
+            Submission.objects.filter(pk__in=submission_ids)
+            .order_by("pk")
+            .select_for_update()
+            .values_list("pk", flat=True)
+        )
+
+    @staticmethod
+    def bulk_grade(items, graded_by, assignment_id=None):
+        """
+        Grades many submissions at once. `items` are dicts with `submission`
+        (id), `score` and `feedback`. One query checks that every submission
+        exists (in the assignment, when given) and belongs to a course taught
+        by `graded_by`, one loads the courses' grading scales, one locks the
+        submissions, one reads the scores being replaced and one upsert writes
+        all grades. The assignments' stats get one update each.
+
+        Returns a result per item, in order: the grade letter, or an `error`
+        for items that were skipped. A failing item does not stop the others.
+        """
+        submissions = Submission.objects.filter(
+            id__in={item["submission"] for item in items}
+        )
+        if assignment_id is not None:
+            submissions = submissions.filter(assignment_id=assignment_id)
+        rows = list(
+            submissions.annotate(
+                is_teacher=Exists(
+                    CourseTeacher.objects.filter(
+                        course_id=OuterRef("assignment__lecture__course_id"),
+                        teacher=graded_by,
+                    )
+                )
+            ).values_list(
+                "id", "is_teacher", "assignment_id", "assignment__lecture__course_id"
+            )
+        )
+        can_grade = {row[0]: row[1] for row in rows}
+        assignment_of = {row[0]: row[2] for row in rows}
+        course_of = {row[0]: row[3] for row in rows}
+        scales = GradingScale.for_courses(set(course_of.values()))
+
+        letters = [
+            GradeService.grade_letter(
+                item["score"], scales.get(course_of.get(item["submission"]))
+            )
+            for item in items
+        ]
+        now = timezone.now()
+        results, grades, seen = [], [], set()
+        for item, letter in zip(items, letters):
+            submission_id = item["submission"]
+            if submission_id not in can_grade:
+                error = "Submission not found."
+            elif not can_grade[submission_id]:
+                error = "You are not a teacher of this submission's course."
+            elif submission_id in seen:
+                error = "Submission appears more than once in the batch."
+            else:
+                error = None
+
+            if error:
+                results.append({"submission": submission_id, "error": error})
+                continue
+
+            seen.add(submission_id)
+            grades.append(
+                Grade(
+                    submission_id=submission_id,
+                    score=item["score"],
+                    grade_letter=letter,
+                    feedback=item.get("feedback") or "",
+                    graded_by=graded_by,
+                    graded_at=now,
+                )
+            )
+            results.append(
+                {
+                    "submission": submission_id,
+                    "score": item["score"],
+                    "grade_letter": letter,
+                }
+            )
+
+        with transaction.atomic():
+            graded_ids = [grade.submission_id for grade in grades]
+            GradeService.lock_submissions(graded_ids)
+            previous = dict(
+                Grade.objects.filter(submission_id__in=graded_ids).values_list(
+                    "submission_id", "score"
+                )
+            )
+            Grade.objects.bulk_create(
+                grades,
+                update_conflicts=True,
+                unique_fields=["submission"],
+                update_fields=[
+                    "score",
+                    "grade_letter",
+                    "feedback",
+                    "graded_by",
+                    "graded_at",
+                    "updated_at",
+                ],
+            )
+            deltas = defaultdict(Counter)
+            for grade in grades:
+                deltas[assignment_of[grade.submission_id]].update(
+                    AssignmentStatsService.grade_deltas(
+                        grade.submission_id not in previous,
+                        previous.get(grade.submission_id),
+                        grade.score,
+                    )
+                )
+            for assignment_id, delta in deltas.items():
+                AssignmentStatsService.apply(assignment_id, **delta)
+        return results
+
+    @staticmethod
+    @transaction.atomic
+    def set_grading_scale(course, thresholds):
+        """
+        Stores the course's grading scale and re-letters all its grades with
+        a single UPDATE ... SET grade_letter = CASE ... statement.
+        Returns the number of grades updated.
+        """
+        scale, _ = GradingScale.objects.get_or_create(course=course)
+        scale.thresholds = thresholds
+        scale.full_clean(exclude=["course"])
+        scale.save()
+        return Grade.objects.filter(
+            submission__assignment__lecture__course=course
+        ).update(grade_letter=scale.compile().case("score"))
+
+
+class AssignmentStatsService:
+    @staticmethod
+    def apply(assignment_id, **deltas):
+        """
+        Adds `deltas` ({counter: amount}) to the assignment's stats with one
+        UPDATE ... SET counter = counter + amount, which concurrent writers
+        cannot lose. The first write of an assignment without stats creates them.
+        """
+        deltas = {field: amount for field, amount in deltas.items() if amount}
+        if not deltas:
+            return
+        increments = {field: F(field) + amount for field, amount in deltas.items()}
+        stats = AssignmentStats.objects.filter(assignment_id=assignment_id)
+        if stats.update(updated_at=timezone.now(), **increments):
+            return
+        try:
+            with transaction.atomic():
+                AssignmentStats.objects.create(assignment_id=assignment_id, **deltas)
+        except IntegrityError:
+            # a concurrent write created them first
+            stats.update(updated_at=timezone.now(), **increments)
+
+    @staticmethod
+    def grade_deltas(created, previous_score, score):
+        return {
+            "graded_count": int(created),
+            "scored_count": (score is not None) - (previous_score is not None),
+            "score_total": (score or 0) - (previous_score or 0),
+        }
+
+    @staticmethod
+    def record_submission(submission):
+        AssignmentStatsService.apply(
+            submission.assignment_id,
+            submission_count=1,
+            # numbers restart at 1 only when the student has no other submission
+            student_count=int(submission.submission_number == 1),
+            late_count=int(submission.status == Submission.SubmissionStatus.LATE),
+        )
+
+    @staticmethod
+    def record_submission_deleted(submission):
+        # called once the row is gone, any submission left is another one
+        others = Submission.objects.filter(
+            assignment_id=submission.assignment_id,
+            student_id=submission.student_id,
+        ).exists()
+        AssignmentStatsService.apply(
+            submission.assignment_id,
+            submission_count=-1,
+            student_count=-int(not others),
+            late_count=-int(submission.status == Submission.SubmissionStatus.LATE),
+        )
+
+    @staticmethod
+    def record_grade(assignment_id, created, previous_score, score):
+        AssignmentStatsService.apply(
+            assignment_id,
+            **AssignmentStatsService.grade_deltas(created, previous_score, score),
+        )
+
+    @staticmethod
+    def record_grade_deleted(grade, assignment_id=None):
+        if assignment_id is None:
+            assignment_id = grade.submission.assignment_id
+        AssignmentStatsService.apply(
+            assignment_id,
+            graded_count=-1,
+            scored_count=-int(grade.score is not None),
+            score_total=-(grade.score or 0),
+        )
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild():
+        """
+        Recomputes the stats of every assignment from its submissions and
+        grades with one aggregate query. Returns the number of rows written.
+        """
+        totals = HomeworkAssignment.objects.annotate(
+            submission_count=Count("submissions"),
+            student_count=Count("submissions__student", distinct=True),
+            late_count=Count(
+                "submissions",
+                filter=Q(submissions__status=Submission.SubmissionStatus.LATE),
+            ),
+            graded_count=Count("submissions__grade"),
+            scored_count=Count("submissions__grade__score"),
+            score_total=Coalesce(Sum("submissions__grade__score"), 0),
+        ).values("id", *AssignmentStats.COUNTERS)
+
+        AssignmentStats.objects.all().delete()
+        stats = AssignmentStats.objects.bulk_create(
+            (
+                AssignmentStats(assignment_id=row.pop("id"), **row)
+                for row in totals.iterator()
+            ),
+            batch_size=1000,
+        )
+        return len(stats)
+
+    @staticmethod
+    def course_stats(course):
+        """
+        The stats of every assignment of the course and their totals, read
+        from the stats rows in one query.
+        """
+        rows = (
+            HomeworkAssignment.objects.filter(lecture__course=course)
+            .order_by("lecture__order", "lecture_id", "created_at", "id")
+            .values(
+                "id",
+                "title",
+                "due_date",
+                *(f"stats__{counter}" for counter in AssignmentStats.COUNTERS),
+            )
+        )
+
+        assignments, totals = [], Counter()
+        for row in rows:
+            # assignments nobody has submitted to have no stats row yet
+            counters = {
+                counter: row[f"stats__{counter}"] or 0
+                for counter in AssignmentStats.COUNTERS
+            }
+            totals.update(counters)
+            assignments.append(
+                {
+                    "id": row["id"],
+                    "title": row["title"],
+                    "due_date": row["due_date"],
+                    **AssignmentStatsService._summary(counters),
+                }
+            )
+
+        # a student counts once per assignment, so their sum means nothing here
+        course_totals = {
+            counter: totals[counter]
+            for counter in AssignmentStats.COUNTERS
+            if counter != "student_count"
+        }
+        return {
+            "course": AssignmentStatsService._summary(course_totals),
+            "assignments": assignments,
+        }
+
+    @staticmethod
+    def _summary(counters):
+        return {
+            **counters,
+            "average_score": (
+                round(counters["score_total"] / counters["scored_count"], 2)
+                if counters["scored_count"]
+                else None
+            ),
+            "grading_progress": (
+                round(counters["graded_count"] / counters["submission_count"], 4)
+                if counters["submission_count"]
+                else None
+            ),
+        }
+
+
+class GradebookService:
+    @staticmethod
+    def build(course):
+        """
+        The students x assignments grade table of a course, in columnar form.
+
+        `students` and `assignments` hold one array per column; the matrices
+        (`submission_id`, `score`, `grade_letter`, `late`) have a row per
+        student and a column per assignment, in the same order, with null where
+        the student has not submitted. Each cell reflects the student's latest
+        submission. Three queries: assignments, students, latest submissions.
+        """
+        assignments = list(
+            HomeworkAssignment.objects.filter(lecture__course=course)
+            .order_by("lecture__order", "lecture_id", "created_at", "id")
+            .values_list("id", "title", "due_date")
+        )
+        students = list(
+            Enrollment.objects.filter(
+                course=course,
+                is_active=True,
+                status=Enrollment.Status.ACCEPTED,
+            )
+            .order_by("student__last_name", "student__first_name", "student_id")
+            .values_list(
+                "student_id",
+                "student__email",
+                "student__first_name",
+                "student__last_name",
+            )
+        )
+
+        column = {assignment[0]: index for index, assignment in enumerate(assignments)}
+        row = {student[0]: index for index, student in enumerate(students)}
+        width = len(assignments)
+        matrices = {
+            name: [[None] * width for _ in students]
+            for name in ("submission_id", "score", "grade_letter", "late")
+        }
+
+        for (
+            assignment_id,
+            student_id,
+            submission_id,
+            status,
+            score,
+            letter,
+        ) in GradebookService._latest_submissions(course):
+            if student_id not in row:
+                continue
+            i, j = row[student_id], column[assignment_id]
+            matrices["submission_id"][i][j] = submission_id
+            matrices["score"][i][j] = score
+            matrices["grade_letter"][i][j] = letter
+            matrices["late"][i][j] = status == Submission.SubmissionStatus.LATE
+
+        return {
+            "students": {
+                "id": [student[0] for student in students],
+                "email": [student[1] for student in students],
+                "name": [f"{student[2]} {student[3]}".strip() for student in students],
+            },
+            "assignments": {
+                "id": [assignment[0] for assignment in assignments],
+                "title": [assignment[1] for assignment in assignments],
+                "due_date": [assignment[2] for assignment in assignments],
+            },
+            **matrices,
+        }
+
+    @staticmethod
+    def _latest_submissions(course):
+        """
+        The latest submission of every (assignment, student) pair with its grade,
+        one query: DISTINCT ON where the database has it (postgres), a
+        ROW_NUMBER() window elsewhere.
+        """
+        submissions = Submission.objects.filter(
+            assignment__lecture__course=course
+        ).order_by()
+        columns = (
+            "assignment_id",
+            "student_id",
+            "id",
+            "status",
+            "grade__score",
+            "grade__grade_letter",
+        )
+
+        if connection.features.can_distinct_on_fields:
+            return (
+                submissions.order_by(
+                    "assignment_id", "student_id", "-submission_number"
+                )
+                .distinct("assignment_id", "student_id")
+                .values_list(*columns)
+            )
+
+        return (
+            submissions.annotate(
+                position=Window(
+                    RowNumber(),
+                    partition_by=[F("assignment_id"), F("student_id")],
+                    order_by=F("submission_number").desc(),
+                )
+            )
+            .filter(position=1)
+            .values_list(*columns)
+        )
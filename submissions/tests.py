@@ -1,3 +1,416 @@
-from django.test import TestCase
+import io
+import tempfile
+import time
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipIf
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from common.storage.content_addressed import ContentAddressedStorage, blob_storage
+from common.tests.factories import make_assignment, make_user
+from courses.models import CourseTeacher
+from .ingestion import STAGING_DIR, SubmissionIngestionService
+from .models import (
+    AssignmentStats,
+    Grade,
+    GradeComment,
+    Submission,
+    SubmissionAttachment,
+    SubmissionIngestion,
+    UploadSession,
+    advanced_validator,
+)
+from .services import AssignmentStatsService, GradeService, SubmissionService
+from .uploads import UploadSessionService
 
-# Create your tests here.
+User = get_user_model()
+
+
+class VisibleToPlanTests(TestCase):
+    """
+    Pins the shape of the teacher access filters: a correlated EXISTS on the
+    (course, teacher) index, no DISTINCT and, for the submission page, no sort.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_user(User.Role.TEACHER)
+        cls.assignment = make_assignment(cls.teacher)
+        # a second teacher row per course is what made the old join repeat rows
+        CourseTeacher.objects.create(
+            course=cls.assignment.lecture.course, teacher=make_user(User.Role.TEACHER)
+        )
+        cls.submission = Submission.objects.create(
+            assignment=cls.assignment, student=make_user(User.Role.STUDENT)
+        )
+        cls.grade = Grade.objects.create(submission=cls.submission, score=90)
+        GradeComment.objects.create(grade=cls.grade, author=cls.teacher, message="ok")
+
+    def assertExistsPlan(self, queryset, sorted_by_index=False):
+        self.assertEqual(queryset.count(), 1)
+        sql = str(queryset.query).upper()
+        self.assertIn("EXISTS", sql)
+        self.assertNotIn("DISTINCT", sql)
+
+        plan = queryset.explain()
+        if connection.vendor == "sqlite":
+            self.assertIn("CORRELATED SCALAR SUBQUERY", plan)
+            self.assertIn("courses_courseteacher_course_id_teacher_id", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+        elif connection.vendor == "postgresql":
+            self.assertIn("courses_courseteacher", plan)
+            self.assertNotIn("Unique", plan)
+            self.assertNotIn("HashAggregate", plan)
+            if sorted_by_index:
+                # tiny test tables may be sequentially scanned, which would
+                # hide the index; compare against the plan the index allows
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+                self.assertNotIn("Sort", queryset.explain())
+
+    def test_submissions(self):
+        self.assertExistsPlan(
+            Submission.objects.filter(assignment_id=self.assignment.pk).visible_to(
+                self.teacher
+            ),
+            sorted_by_index=True,
+        )
+
+    def test_grades(self):
+        self.assertExistsPlan(
+            Grade.objects.filter(
+                submission_id=self.submission.pk,
+                submission__assignment_id=self.assignment.pk,
+            ).visible_to(self.teacher)
+        )
+
+    def test_grade_comments(self):
+        self.assertExistsPlan(
+            GradeComment.objects.filter(
+                grade_id=self.grade.pk, grade__submission_id=self.submission.pk
+            ).visible_to(self.teacher)
+        )
+
+    def test_other_teachers_see_nothing(self):
+        outsider = make_user(User.Role.TEACHER)
+        self.assertFalse(Submission.objects.visible_to(outsider).exists())
+        self.assertFalse(Grade.objects.visible_to(outsider).exists())
+        self.assertFalse(GradeComment.objects.visible_to(outsider).exists())
+
+
+class SubmissionNumberTests(TransactionTestCase):
+    """
+    Concurrent submissions get distinct numbers: a conflict on the number is
+    retried with the next one, any other integrity error is raised.
+    """
+
+    def setUp(self):
+        self.assignment = make_assignment(allow_multiple_submissions=True)
+        self.student = make_user(User.Role.STUDENT)
+
+    def numbers(self, student):
+        return sorted(
+            Submission.objects.filter(
+                assignment=self.assignment, student=student
+            ).values_list("submission_number", flat=True)
+        )
+
+    def test_stale_max_is_retried_with_the_next_number(self):
+        SubmissionService.create_submission(self.assignment, self.student)
+        # the first read misses the submission above, as a concurrent one would
+        with mock.patch.object(
+            SubmissionService, "_last_number", side_effect=[None, 1]
+        ) as last_number:
+            submission = SubmissionService.create_submission(
+                self.assignment, self.student
+            )
+        self.assertEqual(last_number.call_count, 2)
+        self.assertEqual(submission.submission_number, 2)
+        self.assertEqual(self.numbers(self.student), [1, 2])
+
+    def test_other_integrity_errors_are_not_retried(self):
+        with mock.patch.object(
+            AssignmentStatsService,
+            "record_submission",
+            side_effect=IntegrityError("not the submission number"),
+        ) as record:
+            with self.assertRaises(IntegrityError):
+                SubmissionService.create_submission(self.assignment, self.student)
+        self.assertEqual(record.call_count, 1)
+        self.assertEqual(self.numbers(self.student), [])
+
+    @skipIf(connection.vendor == "sqlite", "sqlite lets one writer in at a time")
+    def test_parallel_submitters(self):
+        students = [make_user(User.Role.STUDENT) for _ in range(100)]
+
+        def submit(student):
+            try:
+                return SubmissionService.create_submission(self.assignment, student)
+            finally:
+                connection.close()
+
+        # 200 submitters, every student uploading twice at the same time
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            futures = [executor.submit(submit, student) for student in students * 2]
+        errors = [future.exception() for future in futures if future.exception()]
+
+        self.assertEqual(errors, [])
+        for student in students:
+            self.assertEqual(self.numbers(student), [1, 2])
+        self.assertEqual(
+            AssignmentStats.objects.get(assignment=self.assignment).submission_count,
+            200,
+        )
+
+
+class GradeStatsTests(TransactionTestCase):
+    """
+    Single and batch grading of the same submissions, even at the same time,
+    leave the assignment's stats equal to a full recount.
+    """
+
+    def setUp(self):
+        self.teacher = make_user(User.Role.TEACHER)
+        self.assignment = make_assignment(self.teacher)
+        self.submissions = [
+            SubmissionService.create_submission(
+                self.assignment, make_user(User.Role.STUDENT)
+            )
+            for _ in range(40)
+        ]
+
+    def stats(self):
+        return AssignmentStats.objects.filter(assignment=self.assignment).values(
+            *AssignmentStats.COUNTERS
+        )[0]
+
+    def assertStatsMatchRecount(self):
+        live = self.stats()
+        AssignmentStatsService.rebuild()
+        self.assertEqual(live, self.stats())
+
+    def grade_one(self, submission, score):
+        GradeService.create_or_update_grade(submission, score, "", self.teacher)
+
+    def grade_batch(self, submission, score):
+        GradeService.bulk_grade(
+            [{"submission": submission.pk, "score": score}], self.teacher
+        )
+
+    def test_single_and_batch_grading(self):
+        for submission in self.submissions[:20]:
+            self.grade_one(submission, 70)
+        GradeService.bulk_grade(
+            [
+                {"submission": submission.pk, "score": 90}
+                for submission in self.submissions
+            ],
+            self.teacher,
+        )
+        self.assertEqual(self.stats()["graded_count"], 40)
+        self.assertStatsMatchRecount()
+
+    @skipIf(connection.vendor == "sqlite", "sqlite lets one writer in at a time")
+    def test_parallel_grading(self):
+        def grade(grader, submission, score):
+            try:
+                grader(submission, score)
+            finally:
+                connection.close()
+
+        # every submission graded singly and in a batch at the same time
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            futures = [
+                executor.submit(grade, grader, submission, score)
+                for submission in self.submissions
+                for grader, score in ((self.grade_one, 60), (self.grade_batch, 80))
+            ]
+        self.assertEqual([f.exception() for f in futures if f.exception()], [])
+
+        self.assertEqual(self.stats()["graded_count"], 40)
+        self.assertStatsMatchRecount()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class IngestionStagingTests(TestCase):
+    """
+    accept() stages nothing it will refuse and leaves nothing staged behind
+    when the ingestion row cannot be stored.
+    """
+
+    def setUp(self):
+        self.assignment = make_assignment()
+        self.student = make_user(User.Role.STUDENT)
+
+    def staged(self):
+        if not default_storage.exists(STAGING_DIR):
+            return []
+        directories, _ = default_storage.listdir(STAGING_DIR)
+        return [
+            name
+            for directory in directories
+            for name in default_storage.listdir(f"{STAGING_DIR}/{directory}")[1]
+        ]
+
+    def upload(self, size):
+        return SimpleUploadedFile("work.txt", b"x" * size, content_type="text/plain")
+
+    def test_oversized_upload_is_refused_before_staging(self):
+        files = [self.upload(10), self.upload(advanced_validator.max_size + 1)]
+        with self.assertRaises(ValidationError):
+            SubmissionIngestionService.accept(
+                self.assignment, self.student, files=files
+            )
+        self.assertEqual(self.staged(), [])
+        self.assertFalse(SubmissionIngestion.objects.exists())
+
+    def test_failed_insert_removes_staged_files(self):
+        with mock.patch.object(
+            SubmissionIngestion, "save", side_effect=DatabaseError("insert failed")
+        ):
+            with self.assertRaises(DatabaseError):
+                SubmissionIngestionService.accept(
+                    self.assignment, self.student, files=[self.upload(10)]
+                )
+        self.assertEqual(self.staged(), [])
+
+    def test_rolled_back_staging_is_swept(self):
+        kept = SubmissionIngestionService.accept(
+            self.assignment, self.student, files=[self.upload(10)]
+        )
+        try:
+            with transaction.atomic():
+                SubmissionIngestionService.accept(
+                    self.assignment, self.student, files=[self.upload(20)]
+                )
+                raise DatabaseError("the request failed later on")
+        except DatabaseError:
+            pass
+        self.assertEqual(len(self.staged()), 2)
+
+        soon = timezone.now() + timedelta(minutes=1)
+        self.assertEqual(SubmissionIngestionService.discard_orphaned_staging(soon), 1)
+        self.assertEqual(
+            [f"{STAGING_DIR}/{kept.id}/{name}" for name in self.staged()],
+            kept.staged_files,
+        )
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class UploadRangeClaimTests(TransactionTestCase):
+    """
+    A range is streamed outside any transaction, and a second request for the
+    same session is refused while the first one is still writing.
+    """
+
+    def setUp(self):
+        assignment = make_assignment()
+        submission = Submission.objects.create(
+            assignment=assignment, student=make_user(User.Role.STUDENT)
+        )
+        self.session = UploadSessionService.create_session(
+            submission, "notes.txt", 4096
+        )
+
+    def test_concurrent_range_is_refused_while_streaming(self):
+        refused = []
+
+        class Stream:
+            def __init__(self, body):
+                self.body = io.BytesIO(body)
+
+            def read(inner, size):
+                if not refused:
+                    self.assertFalse(connection.in_atomic_block)
+                    retry = UploadSession.objects.get(pk=self.session.pk)
+                    with self.assertRaises(ValidationError) as raised:
+                        UploadSessionService.append_chunk(
+                            retry, 0, io.BytesIO(b"y" * 2048), 2048
+                        )
+                    refused.append(raised.exception)
+                return inner.body.read(size)
+
+        UploadSessionService.append_chunk(self.session, 0, Stream(b"x" * 2048), 2048)
+
+        self.assertEqual(refused[0].code, "offset")
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.received, 2048)
+        self.assertIsNone(self.session.writer)
+        with open(UploadSessionService.staged_path(self.session), "rb") as staged:
+            self.assertEqual(staged.read(), b"x" * 2048)
+
+    def test_failed_write_releases_the_claim(self):
+        class Broken:
+            def read(self, size):
+                raise ValueError("broken stream")
+
+        with self.assertRaises(ValueError):
+            UploadSessionService.append_chunk(self.session, 0, Broken(), 2048)
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.received, self.session.writer), (0, None))
+
+        UploadSessionService.append_chunk(
+            self.session, 0, io.BytesIO(b"x" * 2048), 2048
+        )
+        self.assertEqual(self.session.received, 2048)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class BlobReleaseTests(TestCase):
+    """
+    A blob is kept while a save still pins it and released when the last row
+    storing it is deleted or replaces it.
+    """
+
+    def setUp(self):
+        assignment = make_assignment()
+        self.submission = Submission.objects.create(
+            assignment=assignment, student=make_user(User.Role.STUDENT)
+        )
+
+    def attach(self, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return SubmissionAttachment.objects.create(
+                submission=self.submission,
+                file=SimpleUploadedFile("work.txt", content),
+            )
+
+    def test_pinned_blob_survives_a_concurrent_release(self):
+        first = self.attach(b"same work")
+        with self.captureOnCommitCallbacks(execute=True):
+            second = SubmissionAttachment.objects.create(
+                submission=self.submission,
+                file=SimpleUploadedFile("copy.txt", b"same work"),
+            )
+            first.delete()
+            # a release that cannot see the uncommitted row yet
+            with mock.patch.object(
+                ContentAddressedStorage, "is_referenced", return_value=False
+            ):
+                blob_storage.release_blob(second.file.name)
+            self.assertTrue(blob_storage.exists(second.file.name))
+        self.assertTrue(blob_storage.exists(second.file.name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(blob_storage.exists(second.file.name))
+
+    def test_replaced_file_is_released(self):
+        attachment = self.attach(b"draft")
+        draft = attachment.file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment.file = SimpleUploadedFile("work.txt", b"final")
+            attachment.save()
+        self.assertFalse(blob_storage.exists(draft))
+        self.assertTrue(blob_storage.exists(attachment.file.name))
+
+    def test_stale_pins_release_rolled_back_blobs(self):
+        name = blob_storage.save("work.txt", SimpleUploadedFile("work.txt", b"x"))
+        # the row storing it was never committed
+        self.assertEqual(blob_storage.release_stale_pins(time.time() + 1), 1)
+        self.assertFalse(blob_storage.exists(name))
@@ -0,0 +1,185 @@
+import os
+import uuid
+from datetime import timedelta
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import SubmissionAttachment, UploadSession, advanced_validator
+
+UPLOAD_DIR = "upload_sessions"
+CHUNK_SIZE = 64 * 1024
+# enough of the file for libmagic to decide its type
+SNIFF_SIZE = 2048
+# a range claim older than this belongs to a request that died mid-write
+CLAIM_TIMEOUT = timedelta(minutes=15)
+
+
+class UploadSessionService:
+    @staticmethod
+    def create_session(submission, filename, size):
+        max_size = advanced_validator.max_size
+        if max_size and size > max_size:
+            raise ValidationError(
+                f"file size is bigger then {max_size / (1024 * 1024)} MB."
+            )
+        return UploadSession.objects.create(
+            submission=submission, filename=os.path.basename(filename), size=size
+        )
+
+    @staticmethod
+    def append_chunk(session, start, stream, length):
+        """
+        Writes the byte range [start, start + length) read from `stream` to the
+        staged file, CHUNK_SIZE bytes at a time. The range must start where the
+        previous one ended. If the connection drops, the bytes that did arrive
+        are kept and the client resumes from `session.received`.
+
+        The range is claimed with a conditional UPDATE before any byte is read,
+        so a retry sent while the first request is still streaming is refused
+        instead of truncating the file under it. No transaction or row lock is
+        held while the client sends the body.
+        """
+        if start + length > session.size:
+            raise ValidationError("The range goes past the end of the file.")
+
+        writer = uuid.uuid4()
+        claimed = (
+            UploadSession.objects.filter(
+                pk=session.pk, status=UploadSession.Status.OPEN, received=start
+            )
+            .filter(
+                # a claim left by a crashed worker expires
+                Q(writer__isnull=True)
+                | Q(updated_at__lt=timezone.now() - CLAIM_TIMEOUT)
+            )
+            .update(writer=writer, updated_at=timezone.now())
+        )
+        if not claimed:
+            UploadSessionService._refuse_range(session, start)
+
+        written = 0
+        try:
+            path = UploadSessionService.staged_path(session)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "r+b" if os.path.exists(path) else "wb") as staged:
+                staged.seek(start)
+                # drop whatever an interrupted request left past the recorded offset
+                staged.truncate()
+                while written < length:
+                    try:
+                        chunk = stream.read(min(CHUNK_SIZE, length - written))
+                    except OSError:
+                        break
+                    if not chunk:
+                        break
+                    staged.write(chunk)
+                    written += len(chunk)
+        except BaseException:
+            # keep the offset, the next range rewrites from there
+            UploadSession.objects.filter(pk=session.pk, writer=writer).update(
+                writer=None
+            )
+            raise
+
+        released = UploadSession.objects.filter(pk=session.pk, writer=writer).update(
+            writer=None, received=start + written, updated_at=timezone.now()
+        )
+        if not released:
+            raise ValidationError(
+                "The upload was taken over by another request.", code="offset"
+            )
+        session.received = start + written
+        UploadSessionService._check_head(session, start)
+        return session
+
+    @staticmethod
+    def finalize(session):
+        """
+        Runs the attachment validators on the complete file and attaches it to
+        the submission. The staged file is removed afterwards.
+        """
+        if session.received != session.size:
+            raise ValidationError(
+                f"The upload is incomplete, {session.received} of "
+                f"{session.size} bytes received."
+            )
+
+        path = UploadSessionService.staged_path(session)
+        file_field = SubmissionAttachment._meta.get_field("file")
+        with File(open(path, "rb"), name=session.filename) as upload:
+            try:
+                file_field.run_validators(upload)
+            except ValidationError:
+                UploadSessionService.discard(session)
+                raise
+
+            with transaction.atomic():
+                session = UploadSession.objects.select_for_update().get(pk=session.pk)
+                if session.status != UploadSession.Status.OPEN:
+                    raise ValidationError("The upload is already finalized.")
+                session.attachment = SubmissionAttachment.objects.create(
+                    submission_id=session.submission_id, file=upload
+                )
+                session.status = UploadSession.Status.COMPLETED
+                session.save(update_fields=["attachment", "status", "updated_at"])
+
+        os.remove(path)
+        return session
+
+    @staticmethod
+    def discard(session):
+        path = UploadSessionService.staged_path(session)
+        if os.path.exists(path):
+            os.remove(path)
+        session.delete()
+
+    @staticmethod
+    def discard_stale(older_than):
+        """
+        Removes open sessions not touched since `older_than`, with their staged files.
+        """
+        stale = UploadSession.objects.filter(
+            status=UploadSession.Status.OPEN, updated_at__lt=older_than
+        )
+        count = 0
+        for session in stale.iterator():
+            UploadSessionService.discard(session)
+            count += 1
+        return count
+
+    @staticmethod
+    def staged_path(session):
+        return default_storage.path(f"{UPLOAD_DIR}/{session.id}.part")
+
+    @staticmethod
+    def _refuse_range(session, start):
+        session.refresh_from_db(fields=["status", "received", "writer"])
+        if session.status != UploadSession.Status.OPEN:
+            raise ValidationError("The upload is already finalized.")
+        if start != session.received:
+            raise ValidationError(
+                f"The range must start at byte {session.received}.", code="offset"
+            )
+        raise ValidationError(
+            "Another range of this upload is being written.", code="offset"
+        )
+
+    @staticmethod
+    def _check_head(session, start):
+        # the type is checked as soon as its first bytes are in, so a wrong file
+        # is refused without waiting for the rest of it
+        sniff_end = min(SNIFF_SIZE, session.size)
+        if not start < sniff_end <= session.received:
+            return
+
+        with open(UploadSessionService.staged_path(session), "rb") as staged:
+            head = ContentFile(staged.read(SNIFF_SIZE))
+        try:
+            advanced_validator.validate_type(head)
+        except ValidationError:
+            UploadSessionService.discard(session)
+            raise
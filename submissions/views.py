@@ -1,14 +1,28 @@
+import re
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.shortcuts import get_object_or_404
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
-from .models import Submission, SubmissionAttachment, Grade, GradeComment
+from .models import (
+    Submission,
+    SubmissionAttachment,
+    SubmissionIngestion,
+    UploadSession,
+    Grade,
+    GradeComment,
+)
 from lectures.models import HomeworkAssignment
-from .services import SubmissionService, GradeService
+from .services import BULK_GRADE_MAX_ITEMS, SubmissionService, GradeService
+from .ingestion import SubmissionIngestionService
+from .uploads import UploadSessionService
 from .serializers import (
     SubmissionSerializer,
     SubmissionAttachmentSerializer,
+    SubmissionIngestionSerializer,
+    UploadSessionSerializer,
+    BulkGradeItemSerializer,
     GradeSerializer,
     GradeCommentSerializer,
 )
@@ -19,15 +33,26 @@ from common.Permissions.student_and_teacher_permissions import (
 )
 from common.Permissions.studentpermissions import IsStudent, IsEnrolledStudent
 from common.Permissions.teacherpermissions import IsCourseTeacher, IsTeacher
+from common.pagination.paginators import (
+    SubmissionPagination,
+    GradePagination,
+    GradeCommentPagination,
+)
 
 
 class SubmissionViewSet(viewsets.ModelViewSet):
     queryset = Submission.objects.all()
     serializer_class = SubmissionSerializer
+    pagination_class = SubmissionPagination
 
     def get_permissions(self):
-        if self.action in ["create"]:
+        if self.action in ["create", "create_async"]:
             self.permission_classes = [IsAuthenticated, IsStudent, IsEnrolledStudent]
+        elif self.action in ["async_status"]:
+            self.permission_classes = [IsAuthenticated, IsStudent]
+        elif self.action in ["bulk_grade"]:
+            # course membership is checked per submission by GradeService.bulk_grade
+            self.permission_classes = [IsAuthenticated, IsTeacher]
         elif self.action in ["retrieve"]:
             self.permission_classes = [
                 IsAuthenticated,
@@ -48,17 +73,12 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         return super().get_permissions()
 
     def get_queryset(self):
-        user = self.request.user
-        queryset = super().get_queryset()
-        if user.is_authenticated:
-            if user.role == user.Role.STUDENT:
-                return queryset.filter(student=user)
-            elif user.role == user.Role.TEACHER:
-                return queryset.filter(
-                    assignment__lecture__course__courseteacher__teacher=user
-                ).distinct()  # avoid duplicates if multiple roles()
-
-        return queryset.none()
+        return (
+            super()
+            .get_queryset()
+            .filter(assignment_id=self.kwargs.get("assignment_pk"))
+            .visible_to(self.request.user)
+        )
 
     def perform_create(self, serializer):
         assignment_id = self.kwargs.get("assignment_pk")
@@ -70,10 +90,212 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         )
         serializer.instance = submission
 
+    def perform_destroy(self, instance):
+        SubmissionService.delete_submission(instance)
+
+    @action(detail=False, methods=["post"], url_path="async")
+    def create_async(self, request, *args, **kwargs):
+        """
+        Accepts a submission for background processing and answers right away.
+        Meant for deadline bursts, the receive time is kept for the late check.
+        Poll the returned status url until the status is COMPLETED or FAILED.
+        """
+        assignment = get_object_or_404(
+            HomeworkAssignment, pk=self.kwargs.get("assignment_pk")
+        )
+        serializer = SubmissionIngestionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            ingestion = SubmissionIngestionService.accept(
+                assignment=assignment,
+                student=request.user,
+                text=serializer.validated_data.get("text", ""),
+                files=serializer.validated_data.get("files", []),
+            )
+        except DjangoValidationError as e:
+            return Response(
+                {"detail": e.messages[0]}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(
+            SubmissionIngestionSerializer(ingestion).data,
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path=(
+            "async/(?P<ingestion_id>"
+            "[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})"
+        ),
+    )
+    def async_status(self, request, ingestion_id=None, *args, **kwargs):
+        ingestion = get_object_or_404(
+            SubmissionIngestion,
+            pk=ingestion_id,
+            assignment_id=self.kwargs.get("assignment_pk"),
+            student=request.user,
+        )
+        return Response(SubmissionIngestionSerializer(ingestion).data)
+
+    @action(detail=False, methods=["post"], url_path="bulk-grade")
+    def bulk_grade(self, request, *args, **kwargs):
+        """
+        Grades many submissions of the assignment in one request, given as
+        {"grades": [{"submission": id, "score": 0-100 or null, "feedback": ""}]}.
+        Answers with a result per entry; invalid entries are reported and skipped.
+        """
+        entries = request.data
+        if isinstance(entries, dict):
+            entries = entries.get("grades")
+        if not isinstance(entries, list):
+            return Response(
+                {"detail": "grades must be a list."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(entries) > BULK_GRADE_MAX_ITEMS:
+            return Response(
+                {"detail": f"At most {BULK_GRADE_MAX_ITEMS} grades per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = [None] * len(entries)
+        items, positions = [], []
+        for index, entry in enumerate(entries):
+            serializer = BulkGradeItemSerializer(data=entry)
+            if serializer.is_valid():
+                items.append(serializer.validated_data)
+                positions.append(index)
+            else:
+                results[index] = {"errors": serializer.errors}
+
+        graded = GradeService.bulk_grade(
+            items, request.user, assignment_id=self.kwargs.get("assignment_pk")
+        )
+        for index, result in zip(positions, graded):
+            results[index] = result
+
+        failed = sum("error" in result or "errors" in result for result in results)
+        return Response(
+            {
+                "graded": len(results) - failed,
+                "failed": failed,
+                "results": results,
+            }
+        )
+
+
+CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+class UploadSessionViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Resumable attachment uploads for a student's own submission.
+
+    POST creates a session for a file of `size` bytes, each PUT sends one byte
+    range with a `Content-Range: bytes start-end/size` header and the raw bytes
+    as body, GET tells how many bytes are stored (where to resume) and
+    POST finalize/ validates the file and attaches it to the submission.
+    """
+
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated, IsStudent]
+
+    def get_queryset(self):
+        return (
+            super()
+            .get_queryset()
+            .filter(
+                submission_id=self.kwargs.get("submission_pk"),
+                submission__assignment_id=self.kwargs.get("assignment_pk"),
+                submission__student=self.request.user,
+            )
+            .select_related("attachment")
+        )
+
+    def create(self, request, *args, **kwargs):
+        submission = get_object_or_404(
+            Submission,
+            pk=self.kwargs.get("submission_pk"),
+            assignment_id=self.kwargs.get("assignment_pk"),
+            student=request.user,
+        )
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            session = UploadSessionService.create_session(
+                submission=submission,
+                filename=serializer.validated_data["filename"],
+                size=serializer.validated_data["size"],
+            )
+        except DjangoValidationError as e:
+            return Response(
+                {"detail": e.messages[0]}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(
+            self.get_serializer(session).data, status=status.HTTP_201_CREATED
+        )
+
+    def update(self, request, *args, **kwargs):
+        session = self.get_object()
+        match = CONTENT_RANGE.match(request.headers.get("Content-Range", ""))
+        if not match:
+            return Response(
+                {
+                    "detail": "A 'Content-Range: bytes start-end/size' header is required."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        start, end, total = (int(value) for value in match.groups())
+        if end < start or total != session.size:
+            return Response(
+                {"detail": "Content-Range does not match the upload."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            UploadSessionService.append_chunk(
+                session, start, request.stream, length=end - start + 1
+            )
+        except DjangoValidationError as e:
+            if e.code != "offset":
+                return Response(
+                    {"detail": e.messages[0]}, status=status.HTTP_400_BAD_REQUEST
+                )
+            # tell the client where to resume from
+            session.refresh_from_db(fields=["received"])
+            return Response(
+                {"detail": e.messages[0], "received": session.received},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(self.get_serializer(session).data)
+
+    def perform_destroy(self, instance):
+        UploadSessionService.discard(instance)
+
+    @action(detail=True, methods=["post"])
+    def finalize(self, request, *args, **kwargs):
+        session = self.get_object()
+        try:
+            session = UploadSessionService.finalize(session)
+        except DjangoValidationError as e:
+            return Response(
+                {"detail": " ".join(e.messages)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(self.get_serializer(session).data)
+
 
 class GradeViewSet(viewsets.ModelViewSet):
     queryset = Grade.objects.all()
     serializer_class = GradeSerializer
+    pagination_class = GradePagination
 
     def get_permissions(self):
         if self.action in ["create", "update", "partial_update", "destroy"]:
@@ -91,26 +313,15 @@ class GradeViewSet(viewsets.ModelViewSet):
         return super().get_permissions()
 
     def get_queryset(self):
-        user = self.request.user
-        queryset = super().get_queryset()  # Grade.objects.all()
-
-        if not user.is_authenticated:
-            return queryset.none()
-
-        assignment_id = self.kwargs.get("assignment_pk")
-
-        if user.role == user.Role.TEACHER:
-            return queryset.filter(
-                submission__assignment_id=assignment_id,
-                submission__assignment__lecture__course__coursedteacher__teacher=user,
+        return (
+            super()
+            .get_queryset()
+            .filter(
+                submission_id=self.kwargs.get("submission_pk"),
+                submission__assignment_id=self.kwargs.get("assignment_pk"),
             )
-
-        if user.role == user.Role.STUDENT:
-            return queryset.filter(
-                submission__assignment_id=assignment_id, submission__student=user
-            )
-
-        return queryset.none()
+            .visible_to(self.request.user)
+        )
 
     def perform_create(self, serializer):
         submission_id = self.kwargs.get("submission_pk")
@@ -134,27 +345,25 @@ class GradeViewSet(viewsets.ModelViewSet):
         )
         serializer.instance = grade
 
+    def perform_destroy(self, instance):
+        GradeService.delete_grade(instance)
+
 
 class GradeCommentViewSet(viewsets.ModelViewSet):
     queryset = GradeComment.objects.all()
     serializer_class = GradeCommentSerializer
+    pagination_class = GradeCommentPagination
 
     def get_queryset(self):
-        user = self.request.user
-        grade_id = self.kwargs.get("grade_pk")
-        if not user.is_authenticated:
-            return GradeComment.objects.none()
-
-        queryset = GradeComment.objects.filter(grade_id=grade_id)
-
-        if user.role == user.Role.TEACHER:
-            queryset = queryset.filter(
-                grade__assignment__lecture__course__coursedteacher__teacher=user
+        return (
+            super()
+            .get_queryset()
+            .filter(
+                grade_id=self.kwargs.get("grade_pk"),
+                grade__submission_id=self.kwargs.get("submission_pk"),
             )
-        elif user.role == user.Role.STUDENT:
-            queryset = queryset.filter(grade__student=user)
-
-        return queryset
+            .visible_to(self.request.user)
+        )
 
     def get_permissions(self):
         if self.action in ["update", "partial_update", "destroy"]:
@@ -0,0 +1,36 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .models import ClaimsUser
+
+CLAIMS = ("role", "is_active")
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that trusts the token instead of loading the user row.
+    request.user is a ClaimsUser carrying the id, role and is_active claims
+    added at login (see CustomTokenObtainPairSerializer). Tokens issued before
+    those claims existed are authenticated the usual way.
+    """
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in CLAIMS):
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if not validated_token["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return ClaimsUser.from_claims(
+            **{
+                api_settings.USER_ID_FIELD: user_id,
+                "role": validated_token["role"],
+                "is_active": validated_token["is_active"],
+            }
+        )
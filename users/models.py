@@ -43,3 +43,28 @@ class User(AbstractUser):
     REQUIRED_FIELDS = []
 
     objects = UserManager()
+
+
+class ClaimsUser(User):
+    """
+    A User built from access token claims without touching the database.
+    Only `id`, `role` and `is_active` are set, the first access to any other
+    field loads the rest of the row with one query.
+    """
+
+    class Meta:
+        proxy = True
+
+    @classmethod
+    def from_claims(cls, **claims):
+        field_names = [
+            f.attname for f in cls._meta.concrete_fields if f.attname in claims
+        ]
+        return cls.from_db(None, field_names, [claims[name] for name in field_names])
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and set(fields) <= deferred:
+            # load every deferred field together instead of one query per attribute
+            fields = list(deferred)
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
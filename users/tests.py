@@ -1,3 +1,37 @@
 from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from .models import User
 
-# Create your tests here.
+
+class TokenRefreshClaimsTests(TestCase):
+    """
+    A refreshed access token carries the user's current role, not the one
+    they had when they logged in.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            "student@example.com", role=User.Role.STUDENT
+        )
+        self.refresh = str(RefreshToken.for_user(self.user))
+        self.client = APIClient()
+
+    def refresh_token(self):
+        return self.client.post(
+            "/api/auth/token/refresh/", {"refresh": self.refresh}, format="json"
+        )
+
+    def test_role_change_reaches_the_next_access_token(self):
+        User.objects.filter(pk=self.user.pk).update(role=User.Role.TEACHER)
+        # the user row is loaded once, as the stock refresh does
+        with self.assertNumQueries(1):
+            response = self.refresh_token()
+        self.assertEqual(response.status_code, 200)
+        access = AccessToken(response.json()["access"])
+        self.assertEqual(access["role"], User.Role.TEACHER)
+        self.assertTrue(access["is_active"])
+
+    def test_inactive_user_cannot_refresh(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.refresh_token().status_code, 401)